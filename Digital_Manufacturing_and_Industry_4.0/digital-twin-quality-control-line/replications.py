@@ -0,0 +1,207 @@
+# Monte Carlo replications of the Quality Control Line digital twin
+# Runs independently seeded shifts across a process pool and reports each KPI
+# as a mean with a confidence interval, adding replications until the
+# interval is tight enough to base a capacity decision on
+import argparse
+import csv
+import hashlib
+import math
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import simulation
+
+
+# REPLICATION PARAMETERS
+BASE_SEED = 2024            # replication i always gets the same seed
+CONFIDENCE = 0.95
+MIN_REPS = 10               # first batch, before the CI is trusted
+MAX_REPS = 5000
+TARGET_METRIC = "throughput"
+REL_HALF_WIDTH = 0.01       # stop once the CI half-width is within 1% of the mean
+
+
+# SUPPORTING FUNCTIONS
+def replication_seed(base_seed, index):
+    """
+    64-bit seed for replication `index`, hashed so that neighbouring
+    replications (and neighbouring base seeds) get unrelated streams.
+    """
+    digest = hashlib.sha256(f"{base_seed}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def kpi_row(kpi):
+    """
+    Flattens the KPIs of one run into a row of numeric columns.
+    """
+    row = {
+        "throughput": kpi["throughput"],
+        "fpy": kpi["fpy"],
+        "scrap_rate": kpi["scrap_rate"],
+    }
+    for s in kpi["util"]:
+        row[f"util_{s}"] = kpi["util"][s]
+        row[f"oee_{s}"] = kpi["oee"][s]
+        row[f"queue_{s}"] = kpi["queue"][s]
+    for stat in ("mean", "p50", "p90", "p99"):
+        row[f"ct_{stat}"] = kpi["cycle_time"][stat]
+    return row
+
+
+def run_replication(job):
+    """
+    Runs one shift in a worker process and flattens its KPIs into one row.
+    """
+    base_seed, index, shift_min = job
+    kpi = simulation.simulate(replication_seed(base_seed, index), shift_min)
+    return {"replication": index, **kpi_row(kpi)}
+
+
+def t_cdf(t, df):
+    """
+    Student t CDF in closed form for df = 1..4 (Abramowitz & Stegun 26.7.4).
+    """
+    if df == 1:
+        return 0.5 + math.atan(t) / math.pi
+    if df == 2:
+        return 0.5 + t / (2 * math.sqrt(2 + t * t))
+    if df == 3:
+        x = t / math.sqrt(3)
+        return 0.5 + (x / (1 + x * x) + math.atan(x)) / math.pi
+    if df == 4:
+        c = 1 + t * t / 4
+        return 0.5 + 0.375 * t / math.sqrt(c) * (1 - t * t / (12 * c))
+    raise ValueError(f"closed-form t CDF only for df 1-4, got {df}")
+
+
+def t_quantile(p, df):
+    """
+    Student t quantile. For df < 5, bisection on the exact CDF; otherwise
+    from the normal quantile by the Cornish-Fisher expansion (Abramowitz &
+    Stegun 26.7.5), within 0.001 of the exact value for df >= 5.
+    """
+    if df < 1:
+        raise ValueError(f"t quantile needs df >= 1, got {df}")
+    if df < 5:
+        lo, hi = -1.0, 1.0
+        while t_cdf(lo, df) > p:
+            lo *= 2
+        while t_cdf(hi, df) < p:
+            hi *= 2
+        for _ in range(100):
+            mid = (lo + hi) / 2
+            if t_cdf(mid, df) < p:
+                lo = mid
+            else:
+                hi = mid
+        return (lo + hi) / 2
+    z = NormalDist().inv_cdf(p)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df**2 + g3 / df**3 + g4 / df**4
+
+
+def confidence_interval(values, confidence=CONFIDENCE):
+    """
+    (mean, half-width) of the t confidence interval for the mean.
+    """
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, math.inf
+    t = t_quantile(0.5 + confidence / 2, len(values) - 1)
+    return mean, t * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def summarize(rows, confidence=CONFIDENCE):
+    """
+    {metric: (mean, half-width)} for every KPI column of the replication rows.
+    """
+    if not rows:
+        raise ValueError("no replications to summarize")
+    metrics = [key for key in rows[0] if key != "replication"]
+    return {m: confidence_interval([row[m] for row in rows], confidence) for m in metrics}
+
+
+#                           REPLICATION RUNNER
+def run_replications(n=None, metric=TARGET_METRIC, half_width=None, rel_half_width=REL_HALF_WIDTH,
+                     min_reps=MIN_REPS, max_reps=MAX_REPS, workers=None, base_seed=BASE_SEED,
+                     shift_min=None, confidence=CONFIDENCE):
+    """
+    Runs replications across a process pool:
+    - With n, exactly n replications
+    - Otherwise starts with min_reps, then after each batch estimates how many
+      replications the target needs, n = (t * s / target)^2, and runs the
+      shortfall, until the half-width of `metric` is at most half_width
+      (or rel_half_width of its mean) or max_reps is reached
+    Replication i always uses the same seed, so results don't depend on
+    the number of workers. Returns (rows in replication order, summary).
+    """
+    if (n if n is not None else min_reps) < 2:
+        raise ValueError("a confidence interval needs at least 2 replications")
+    workers = workers or os.cpu_count() or 1
+    rows = []
+    target = n if n is not None else min_reps
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            jobs = [(base_seed, i, shift_min) for i in range(len(rows), target)]
+            # a few chunks per worker: few round trips, but still balanced
+            chunksize = max(1, len(jobs) // (workers * 4))
+            rows.extend(pool.map(run_replication, jobs, chunksize=chunksize))
+            if n is not None or len(rows) >= max_reps:
+                break
+            values = [row[metric] for row in rows]
+            mean, hw = confidence_interval(values, confidence)
+            goal = half_width if half_width is not None else rel_half_width * abs(mean)
+            if hw <= goal:
+                break
+            t = t_quantile(0.5 + confidence / 2, len(values) - 1)
+            needed = math.ceil((t * statistics.stdev(values) / goal) ** 2) if goal > 0 else max_reps
+            target = min(max_reps, max(needed, len(rows) + workers))
+    return rows, summarize(rows, confidence)
+
+
+def save_rows(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+#                           RUN MAIN PROGRAM
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel Monte Carlo replications of the QC line")
+    parser.add_argument("-n", "--replications", type=int, help="fixed number of replications (default: adaptive)")
+    parser.add_argument("--metric", default=TARGET_METRIC, help="KPI whose CI decides when to stop")
+    parser.add_argument("--half-width", type=float, help="absolute CI half-width target for --metric")
+    parser.add_argument("--rel-half-width", type=float, default=REL_HALF_WIDTH,
+                        help="CI half-width target as a fraction of the mean")
+    parser.add_argument("--max-reps", type=int, default=MAX_REPS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=BASE_SEED)
+    parser.add_argument("--shift-min", type=float, default=simulation.SHIFT_MIN, help="simulated minutes per replication")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--output", help="CSV with one row per replication")
+    args = parser.parse_args()
+    if args.replications is not None and args.replications < 2:
+        parser.error("-n must be at least 2: a confidence interval needs two replications")
+
+    started = time.perf_counter()
+    rows, summary = run_replications(args.replications, args.metric, args.half_width, args.rel_half_width,
+                                     max_reps=args.max_reps, workers=args.workers, base_seed=args.seed,
+                                     shift_min=args.shift_min, confidence=args.confidence)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n====== {len(rows)} REPLICATIONS, {args.confidence:.0%} CONFIDENCE INTERVALS ======")
+    for metric, (mean, hw) in summary.items():
+        print(f"{metric:>20}: {mean:10.4f} ± {hw:.4f}")
+    print(f"{len(rows)} replications on {args.workers} workers in {elapsed:.2f}s "
+          f"({len(rows) / elapsed:.1f} replications/s)")
+    if args.output:
+        save_rows(args.output, rows)
+        print(f"Saved replications → {args.output}")
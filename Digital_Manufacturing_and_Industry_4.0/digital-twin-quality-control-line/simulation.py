@@ -1,11 +1,13 @@
 # Simulating a 3 station Quality Control Line with a Digital Twin
 # Each station has a different processing time and a different probability of failure
-import random
-import time
-import statistics
-import csv
+import argparse
+import copy
+import zlib
+import numpy as np
 import simpy
 
+from streaming import InspectionWriter, Summary, TimeWeighted
+
 
 # GLOBAL SIMULATION PARAMETERS
 SHIFT_MIN = 8 * 60          # total simulated minutes (8h shift)
@@ -43,242 +45,365 @@ PROC_SIGMA = 0.05          # natural process variation
 GAUGE_SIGMA = 0.01         # measurement noise
 LSL, USL = 9.9, 10.1       # spec limits
 
-# DATA COLLECTION STRUCTURES
-RESOURCES = {}
-DOWN = {}                  # machine DOWN state
-UTIL_TIME = {}             # busy time per station
-QUEUES = {}                # queue length samples
-
-inspection_log = []        # CSV save
-cycle_times = []           # final CTs
-good_parts = 0
-scrap_parts = 0
-rework_parts = 0
-part_counter = 0           # incremental ID
-
-# SUPPORTING FUNCTIONS
-def breakdown_process(env, station_name):
-    """
-    Simulates random breakdowns for each machine
-    using exponential time distribution (MTBF / MTTR).
-    Runs continuously throughout the simulation.
-    """
-    mtbf = STATIONS[station_name]["mtbf"]
-    mttr = STATIONS[station_name]["mttr"]
-
-    if mtbf >= 9999:
-        return  # Station never breaks down
-
-    while True:
-        # Wait until next failure
-        time_to_failure = random.expovariate(1.0 / mtbf)
-        yield env.timeout(time_to_failure)
-
-        DOWN[station_name] = True
-        # Repair time
-        yield env.timeout(mttr)
-        DOWN[station_name] = False
-
-
+# RANDOM STREAMS
+BLOCK = 1024                # variates drawn per NumPy call
 
-def process_at_station(env, part, station_name):
-    """
-    Handles queueing, waiting, processing, and downtime interruptions.
-    """
-    resource = RESOURCES[station_name]
-    ct_mean = STATIONS[station_name]["ct_mean"]
-    ct_sd = STATIONS[station_name]["ct_sd"]
-
-    # Record queue length for bottleneck detection
-    QUEUES[station_name].append(len(resource.queue))
-
-    # Request the machine
-    with resource.request() as req:
-        yield req
-
-        # Wait if machine is DOWN
-        while DOWN[station_name]:
-            yield env.timeout(0.1)
-
-        # Begin processing
-        start = env.now
-        ct = max(0.01, random.gauss(ct_mean, ct_sd))
-        remaining = ct
-
-        # If breakdown occurs mid-process → pause
-        while remaining > 0:
-            if DOWN[station_name]:
-                yield env.timeout(0.1)
-            else:
-                step = min(0.1, remaining)
-                yield env.timeout(step)
-                remaining -= step
-
-        end = env.now
 
-        # Track utilization
-        UTIL_TIME[station_name] += (end - start)
-
-        # Save timestamps
-        part["history"].append((station_name, start, end))
-
-def inspect_and_classify(part):
+#                           RANDOM STREAMS
+class RandomStream:
     """
-    Performs a noisy measurement and classifies the outcome:
-    PASS, REWORK, or SCRAP.
+    Standard variates ("normal" or "exponential") for one source of
+    randomness, drawn from its own generator in blocks of BLOCK and handed
+    out one at a time.
+    - The generator is seeded from (seed, source name), so a source gets the
+      same variates whatever other sources exist or how much they draw:
+      two scenarios run with the same seed see common random numbers
+    - Draws are scaled by the caller (mean + sd * z, mean * e), so changing
+      a parameter keeps the draws paired instead of shifting the sequence
     """
-    global good_parts, scrap_parts, rework_parts
 
-    true_value = random.gauss(TRUE_MEAN, PROC_SIGMA)
-    measured = random.gauss(true_value, GAUGE_SIGMA)
+    def __init__(self, seed, source, kind, block=BLOCK):
+        sequence = np.random.SeedSequence(seed, spawn_key=(zlib.crc32(source.encode()),))
+        generator = np.random.Generator(np.random.PCG64(sequence))
+        draw = generator.standard_normal if kind == "normal" else generator.standard_exponential
+        self.next = self.variates(draw, block).__next__
 
-    # Log measurement
-    inspection_log.append({
-        "part_id": part["id"],
-        "time": part["birth"],
-        "measurement": measured
-    })
+    @staticmethod
+    def variates(draw, block):
+        while True:
+            # Python floats: cheaper to hand out one at a time than NumPy scalars
+            yield from draw(block).tolist()
 
-    # Classification
-    if measured < LSL - 0.02 or measured > USL + 0.02:
-        scrap_parts += 1
-        return "SCRAP"
+    def normal(self, mean, sd):
+        return mean + sd * self.next()
 
-    if measured < LSL or measured > USL:
-        rework_parts += 1
-        return "REWORK"
+    def exponential(self, mean):
+        return mean * self.next()
 
-    good_parts += 1
-    return "PASS"
 
-#                           PART FLOW LOGIC
-def part_flow(env):
+#                           LINE MODEL
+class LineModel:
     """
-    Handles arrivals + routing parts through Cutting → Assembly → Inspection.
-    Includes REWORK loop.
+    One self-contained run of the line. The configuration comes in as
+    arguments (defaulting to the module-level constants above) and every
+    piece of state lives on the instance, so any number of scenarios can
+    be built and run side by side in one process.
+    Statistics are kept online, so memory does not grow with shift_min;
+    inspection records go to `inspection` (an InspectionWriter) if given.
     """
-    global part_counter
-
-    while True:
-        # Generate new part arrival
-        part_counter += 1
-        part = {
-            "id": part_counter,
-            "birth": env.now,
-            "reworks": 0,
-            "history": []
-        }
 
-        # Cutting
-        yield from process_at_station(env, part, "Cutting")
+    def __init__(self, stations=None, rework_limit=REWORK_LIMIT, shift_min=SHIFT_MIN,
+                 warmup_min=WARMUP_MIN, inter_arrival=INTER_ARRIVAL, true_mean=TRUE_MEAN,
+                 proc_sigma=PROC_SIGMA, gauge_sigma=GAUGE_SIGMA, lsl=LSL, usl=USL, seed=None,
+                 inspection=None):
+        self.stations = copy.deepcopy(STATIONS if stations is None else stations)
+        self.rework_limit = rework_limit
+        self.shift_min = shift_min
+        self.warmup_min = warmup_min
+        self.inter_arrival = inter_arrival
+        self.true_mean = true_mean
+        self.proc_sigma = proc_sigma
+        self.gauge_sigma = gauge_sigma
+        self.lsl, self.usl = lsl, usl
+
+        # One stream per source of randomness; seed=None draws fresh entropy
+        # once so that the sources still come from a single seed
+        seed = np.random.SeedSequence(seed).entropy
+        self.seed = seed
+        self.arrivals = RandomStream(seed, "arrivals", "exponential")
+        self.measurement = RandomStream(seed, "measurement", "normal")
+        self.cycle_time = {s: RandomStream(seed, f"ct:{s}", "normal") for s in self.stations}
+        self.breakdowns = {s: RandomStream(seed, f"breakdown:{s}", "exponential") for s in self.stations}
+
+        # DATA COLLECTION STRUCTURES
+        self.env = simpy.Environment()
+        self.resources = {}
+        self.down = {}             # machine DOWN state
+        self.repaired = {}         # event that fires when a DOWN machine is repaired
+        self.active = {}           # processes currently working a part on each station
+        self.util_time = {}        # busy time per station
+        self.queues = {}           # time-weighted queue length per station
+
+        self.inspection = inspection        # streamed inspection records
+        self.cycle_times = Summary()        # mean / quantiles of final CTs
+        self.good_parts = 0
+        self.scrap_parts = 0
+        self.rework_parts = 0
+        self.part_counter = 0      # incremental ID
+
+    # SUPPORTING FUNCTIONS
+    def breakdown_process(self, station_name):
+        """
+        Simulates random breakdowns for each machine
+        using exponential time distribution (MTBF / MTTR).
+        Runs continuously throughout the simulation.
+        A breakdown interrupts the parts being processed on the station;
+        they resume when the repaired event fires.
+        """
+        env = self.env
+        mtbf = self.stations[station_name]["mtbf"]
+        mttr = self.stations[station_name]["mttr"]
 
-        # Assembly
-        yield from process_at_station(env, part, "Assembly")
+        if mtbf >= 9999:
+            return  # Station never breaks down
 
-        # Inspection + QC loop
         while True:
-            yield from process_at_station(env, part, "Inspection")
-            outcome = inspect_and_classify(part)
+            # Wait until next failure
+            time_to_failure = self.breakdowns[station_name].exponential(mtbf)
+            yield env.timeout(time_to_failure)
+
+            self.down[station_name] = True
+            self.repaired[station_name] = env.event()
+            for proc in list(self.active[station_name]):
+                proc.interrupt("breakdown")
+            # Repair time
+            yield env.timeout(mttr)
+            self.down[station_name] = False
+            self.repaired[station_name].succeed()
+
+    def process_at_station(self, part, station_name):
+        """
+        Handles queueing, waiting, processing, and downtime interruptions.
+        """
+        env = self.env
+        resource = self.resources[station_name]
+        ct_mean = self.stations[station_name]["ct_mean"]
+        ct_sd = self.stations[station_name]["ct_sd"]
+
+        # Request the machine, tracking the queue length for bottleneck detection
+        queue = self.queues[station_name]
+        with resource.request() as req:
+            queue.update(env.now, len(resource.queue))
+            yield req
+            queue.update(env.now, len(resource.queue))
+
+            # Wait if machine is DOWN
+            if self.down[station_name]:
+                yield self.repaired[station_name]
+
+            # Begin processing
+            start = env.now
+            ct = max(0.01, self.cycle_time[station_name].normal(ct_mean, ct_sd))
+            remaining = ct
+
+            # One timeout for the whole cycle. If a breakdown occurs mid-process
+            # it interrupts the timeout → pause until repaired, then finish the rest
+            proc = env.active_process
+            while remaining > 0:
+                self.active[station_name].add(proc)
+                resumed = env.now
+                try:
+                    yield env.timeout(remaining)
+                    remaining = 0
+                except simpy.Interrupt:
+                    remaining -= env.now - resumed
+                    self.active[station_name].discard(proc)
+                    yield self.repaired[station_name]
+                finally:
+                    self.active[station_name].discard(proc)
+
+            end = env.now
+
+            # Track utilization
+            self.util_time[station_name] += (end - start)
+
+            # Save timestamps
+            part["history"].append((station_name, start, end))
+
+    def inspect_and_classify(self, part):
+        """
+        Performs a noisy measurement and classifies the outcome:
+        PASS, REWORK, or SCRAP.
+        """
+        true_value = self.measurement.normal(self.true_mean, self.proc_sigma)
+        measured = self.measurement.normal(true_value, self.gauge_sigma)
+
+        # Log measurement
+        if self.inspection is not None:
+            self.inspection.write(part["id"], part["birth"], measured)
+
+        # Classification
+        if measured < self.lsl - 0.02 or measured > self.usl + 0.02:
+            self.scrap_parts += 1
+            return "SCRAP"
+
+        if measured < self.lsl or measured > self.usl:
+            self.rework_parts += 1
+            return "REWORK"
+
+        self.good_parts += 1
+        return "PASS"
+
+    #                       PART FLOW LOGIC
+    def part_flow(self):
+        """
+        Handles arrivals + routing parts through Cutting → Assembly → Inspection.
+        Includes REWORK loop.
+        """
+        env = self.env
+        while True:
+            # Generate new part arrival
+            self.part_counter += 1
+            part = {
+                "id": self.part_counter,
+                "birth": env.now,
+                "reworks": 0,
+                "history": []
+            }
+
+            # Cutting
+            yield from self.process_at_station(part, "Cutting")
+
+            # Assembly
+            yield from self.process_at_station(part, "Assembly")
+
+            # Inspection + QC loop
+            while True:
+                yield from self.process_at_station(part, "Inspection")
+                outcome = self.inspect_and_classify(part)
+
+                if outcome == "PASS":
+                    # record cycle time
+                    if env.now >= self.warmup_min:
+                        self.cycle_times.add(env.now - part["birth"])
+                    break
 
-            if outcome == "PASS":
-                # record cycle time
-                if env.now >= WARMUP_MIN:
-                    cycle_times.append(env.now - part["birth"])
-                break
+                elif outcome == "SCRAP":
+                    break
 
-            elif outcome == "SCRAP":
-                break
+                elif outcome == "REWORK":
+                    if part["reworks"] >= self.rework_limit:
+                        self.scrap_parts += 1
+                        break
+                    part["reworks"] += 1
+                    # Re-enter Assembly
+                    yield from self.process_at_station(part, "Assembly")
+
+            # Inter-arrival time before next part
+            ia = self.arrivals.exponential(self.inter_arrival)
+            yield env.timeout(ia)
+
+    #                       SIMULATION RUNNER
+    def run(self):
+        """
+        - Creates resources and starts breakdown processes
+        - Starts part flow and runs for shift_min
+        - Returns the KPIs
+        A model runs once; build a new one for the next run.
+        """
+        env = self.env
+
+        # Initialize stations
+        for station in self.stations:
+            self.resources[station] = simpy.Resource(env, capacity=self.stations[station]["capacity"])
+            self.down[station] = False
+            self.active[station] = set()
+            self.util_time[station] = 0
+            self.queues[station] = TimeWeighted(self.warmup_min)
+
+            # Start breakdown process
+            env.process(self.breakdown_process(station))
+
+        # Start part arrival / processing
+        env.process(self.part_flow())
+
+        # Run simulation
+        env.run(until=self.shift_min)
+        return self.kpis()
+
+    def kpis(self):
+        # KPI CALCULATIONS
+        good_parts, scrap_parts = self.good_parts, self.scrap_parts
+        observed = self.shift_min - self.warmup_min
+        total = good_parts + scrap_parts
+        throughput = good_parts / (observed / 60)
+        fpy = good_parts / total if total else 0
+        scrap_rate = scrap_parts / total if total else 0
+
+        util = {s: self.util_time[s] / observed for s in self.stations}
+        bottleneck = max(util, key=util.get)
+        queue = {s: self.queues[s].mean(self.shift_min) for s in self.stations}
+        max_queue = {s: self.queues[s].max for s in self.stations}
+
+        # OEE approximation
+        oee = {}
+        for s in self.stations:
+            mtbf = self.stations[s]["mtbf"]
+            mttr = self.stations[s]["mttr"]
+            if mtbf >= 9999:
+                availability = 1.0
+            else:
+                availability = mtbf / (mtbf + mttr)
+
+            ideal_ct = self.stations[s]["ct_mean"] * 0.95
+            performance = self.stations[s]["ct_mean"] / ideal_ct
+            quality = good_parts / total if total else 0
+
+            oee[s] = availability * performance * quality
+
+        return {
+            "good_parts": good_parts,
+            "scrap_parts": scrap_parts,
+            "rework_parts": self.rework_parts,
+            "total": total,
+            "throughput": throughput,
+            "fpy": fpy,
+            "scrap_rate": scrap_rate,
+            "util": util,
+            "oee": oee,
+            "queue": queue,
+            "max_queue": max_queue,
+            "cycle_time": self.cycle_times.summary(),
+            "bottleneck": bottleneck,
+        }
 
-            elif outcome == "REWORK":
-                if part["reworks"] >= REWORK_LIMIT:
-                    scrap_parts += 1
-                    break
-                part["reworks"] += 1
-                # Re-enter Assembly
-                yield from process_at_station(env, part, "Assembly")
 
-        # Inter-arrival time before next part
-        ia = random.expovariate(1.0 / INTER_ARRIVAL)
-        yield env.timeout(ia)
+def simulate(seed=None, shift_min=None, **config):
+    """
+    Runs one replication of a fresh LineModel and returns its KPIs.
+    config is passed on to LineModel (stations, rework_limit, ...).
+    """
+    if shift_min is not None:
+        config["shift_min"] = shift_min
+    return LineModel(seed=seed, **config).run()
+
 
-#                           SIMULATION RUNNER
-def run_simulation():
+def run_simulation(shift_min=SHIFT_MIN, seed=None, output="inspection_data.csv"):
     """
     Main function:
-    - Initializes environment
-    - Creates resources
-    - Starts breakdown processes
-    - Starts part flow
-    - Runs simulation
+    - Runs the default line for shift_min minutes
+    - Streams inspection records to output (CSV, or Parquet for a .parquet path)
     - Prints KPIs
-    - Saves CSV output
     """
-    global RESOURCES, DOWN, UTIL_TIME, QUEUES
-    env = simpy.Environment()
-
-    # Initialize stations
-    for station in STATIONS:
-        RESOURCES[station] = simpy.Resource(env, capacity=STATIONS[station]["capacity"])
-        DOWN[station] = False
-        UTIL_TIME[station] = 0
-        QUEUES[station] = []
-
-        # Start breakdown process
-        env.process(breakdown_process(env, station))
-
-    # Start part arrival / processing
-    env.process(part_flow(env))
-
-    # Run simulation
-    env.run(until=SHIFT_MIN)
-
-    # KPI CALCULATIONS
-    total = good_parts + scrap_parts
-    throughput = good_parts / ((SHIFT_MIN - WARMUP_MIN) / 60)
-    fpy = good_parts / total if total else 0
-    scrap_rate = scrap_parts / total if total else 0
-
-    util = {s: UTIL_TIME[s] / (SHIFT_MIN - WARMUP_MIN) for s in STATIONS}
-    bottleneck = max(util, key=util.get)
-
-    # OEE approximation
-    oee = {}
-    for s in STATIONS:
-        mtbf = STATIONS[s]["mtbf"]
-        mttr = STATIONS[s]["mttr"]
-        if mtbf >= 9999:
-            availability = 1.0
-        else:
-            availability = mtbf / (mtbf + mttr)
-
-        ideal_ct = STATIONS[s]["ct_mean"] * 0.95
-        performance = STATIONS[s]["ct_mean"] / ideal_ct
-        quality = good_parts / total if total else 0
-
-        oee[s] = availability * performance * quality
+    with InspectionWriter(output) as inspection:
+        model = LineModel(shift_min=shift_min, seed=seed, inspection=inspection)
+        kpi = model.run()
+    ct = kpi["cycle_time"]
 
     # Print KPI Summary
     print("\n============== SIMULATION SUMMARY ==============")
-    print(f"Good parts: {good_parts}")
-    print(f"Scrap parts: {scrap_parts}")
-    print(f"Rework attempts: {rework_parts}")
-    print(f"Total processed: {total}")
-    print(f"Throughput (good/hr): {throughput:.2f}")
-    print(f"FPY: {fpy:.3f}  |  Scrap rate: {scrap_rate:.3f}")
+    print(f"Good parts: {kpi['good_parts']}")
+    print(f"Scrap parts: {kpi['scrap_parts']}")
+    print(f"Rework attempts: {kpi['rework_parts']}")
+    print(f"Total processed: {kpi['total']}")
+    print(f"Throughput (good/hr): {kpi['throughput']:.2f}")
+    print(f"FPY: {kpi['fpy']:.3f}  |  Scrap rate: {kpi['scrap_rate']:.3f}")
     print("Utilization by station:")
-    for s in STATIONS:
-        print(f" - {s}: {util[s]*100:.1f}%  |  OEE: {oee[s]*100:.1f}%")
-    print(f"Bottleneck station: {bottleneck}")
-
-    # Save inspection CSV
-    with open("inspection_data.csv", "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["part_id", "time", "measurement"])
-        writer.writeheader()
-        writer.writerows(inspection_log)
-
-    print("Saved inspection data → inspection_data.csv")
+    for s in model.stations:
+        print(f" - {s}: {kpi['util'][s]*100:.1f}%  |  OEE: {kpi['oee'][s]*100:.1f}%  |  "
+              f"Avg queue: {kpi['queue'][s]:.2f} (max {kpi['max_queue'][s]})")
+    print(f"Bottleneck station: {kpi['bottleneck']}")
+    print(f"Cycle time (min): mean {ct['mean']:.2f}  |  p50 {ct['p50']:.2f}  |  p90 {ct['p90']:.2f}  |  "
+          f"p99 {ct['p99']:.2f}  |  max {ct['max']:.2f}")
+
+    print(f"Saved {inspection.written} inspection records → {output}")
     print("================================================\n")
 
 #                           RUN MAIN PROGRAM
 if __name__ == "__main__":
-    run_simulation()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Digital twin of the 3-station QC line")
+    parser.add_argument("--shift-min", type=float, default=SHIFT_MIN, help="simulated minutes")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", default="inspection_data.csv", help="inspection records (.csv or .parquet)")
+    args = parser.parse_args()
+    run_simulation(args.shift_min, args.seed, args.output)
\ No newline at end of file
@@ -0,0 +1,184 @@
+# Constant-memory statistics and output for long runs of the digital twin
+# Nothing here keeps per-part data: queue lengths are integrated over time as
+# they change, cycle times go into a bounded quantile sketch, and
+# inspection records are written out in buffered batches as they happen
+import csv
+import math
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+
+# STREAMING PARAMETERS
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+RELATIVE_ACCURACY = 0.005   # quantile estimates within 0.5% of the true value
+MIN_VALUE = 1e-9            # smaller values count as zero in the sketch
+BUFFER_ROWS = 10000         # inspection records held before each write
+
+
+#                           ONLINE STATISTICS
+class TimeWeighted:
+    """
+    Time-weighted mean and maximum of a level (e.g. a queue length) that
+    changes at discrete instants. Time before `start` (the warm-up) is
+    ignored. update() must be called with the new level at every change.
+    """
+
+    def __init__(self, start=0.0):
+        self.start = start
+        self.level = 0
+        self.last = start
+        self.area = 0.0
+        self.max = 0
+
+    def update(self, now, level):
+        if now > self.start:
+            self.area += self.level * (now - max(self.last, self.start))
+            self.max = max(self.max, level)
+        else:
+            self.max = level  # the level the observed window starts with
+        self.last = now
+        self.level = level
+
+    def mean(self, now):
+        if now <= self.start:
+            return 0.0
+        area = self.area + self.level * (now - max(self.last, self.start))
+        return area / (now - self.start)
+
+
+class QuantileSketch:
+    """
+    Quantiles of a stream of positive values to within a relative error
+    (DDSketch, Masson et al. 2019). Values are counted in buckets whose
+    bounds grow geometrically by gamma = (1 + a) / (1 - a), so memory depends
+    on the range of the values, not on how many there are, and a quantile
+    comes back within `relative_accuracy` a of the true one.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}          # k → count of values in (gamma^(k-1), gamma^k]
+        self.zeros = 0             # values too small to bucket
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x <= MIN_VALUE:
+            self.zeros += 1
+            return
+        k = math.ceil(math.log(x) / self.log_gamma)
+        self.buckets[k] = self.buckets.get(k, 0) + 1
+
+    def quantile(self, p):
+        if not self.count:
+            return math.nan
+        rank = p * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if seen > rank:
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class Summary:
+    """
+    Count, mean, standard deviation, min, max (Welford's method) and
+    sketched quantiles of a stream of values.
+    """
+
+    def __init__(self, quantiles=QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = quantiles
+        self.sketch = QuantileSketch()
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        self.sketch.add(x)
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0, "mean": math.nan, "sd": math.nan, "min": math.nan, "max": math.nan,
+                    **{f"p{round(p * 100)}": math.nan for p in self.quantiles}}
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "sd": math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            "min": self.min,
+            "max": self.max,
+            **{f"p{round(p * 100)}": self.sketch.quantile(p) for p in self.quantiles},
+        }
+
+
+#                           INSPECTION WRITER
+class InspectionWriter:
+    """
+    Writes inspection records as they happen, buffering BUFFER_ROWS rows
+    between writes. CSV by default; a .parquet path (or fmt="parquet")
+    writes one Parquet row group per buffer and needs pyarrow.
+    """
+
+    FIELDS = ("part_id", "time", "measurement")
+
+    def __init__(self, path, fmt=None, buffer_rows=BUFFER_ROWS):
+        self.path = path
+        self.fmt = fmt or ("parquet" if str(path).endswith(".parquet") else "csv")
+        self.buffer_rows = buffer_rows
+        self.rows = []
+        self.written = 0
+        if self.fmt == "parquet":
+            if pq is None:
+                raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+            self.schema = pa.schema([("part_id", pa.int64()), ("time", pa.float64()), ("measurement", pa.float64())])
+            self.parquet = pq.ParquetWriter(path, self.schema)
+        else:
+            self.file = open(path, "w", newline="")
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(self.FIELDS)
+
+    def write(self, part_id, time, measurement):
+        self.rows.append((part_id, time, measurement))
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.fmt == "parquet":
+            # Explicit schema: inferred per buffer, a run of integer times
+            # (part 1 is born at 0) would come out int64 and not match the file
+            columns = zip(*self.rows)
+            self.parquet.write_table(pa.table(dict(zip(self.FIELDS, map(list, columns))), schema=self.schema))
+        else:
+            self.csv.writerows(self.rows)
+        self.written += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.fmt == "parquet":
+            self.parquet.close()
+        else:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
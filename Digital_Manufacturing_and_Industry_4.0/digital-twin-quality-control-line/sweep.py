@@ -0,0 +1,209 @@
+# Design-of-experiments sweep over the Quality Control Line digital twin
+# Builds a set of line configurations (full grid or Latin hypercube over the
+# chosen factors), runs every configuration for the same replication seeds
+# across a process pool, and writes one results table with a confidence
+# interval for each KPI of each scenario
+import argparse
+import copy
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import simulation
+from replications import BASE_SEED, CONFIDENCE, TARGET_METRIC, confidence_interval, kpi_row, replication_seed, summarize
+
+
+# SWEEP PARAMETERS
+REPS = 20                   # replications per scenario
+LEVELS = 3                  # grid points per continuous factor
+SAMPLES = 20                # scenarios in a Latin hypercube
+INTEGER_PARAMS = {"capacity", "rework_limit"}
+LINE_PARAMS = {"rework_limit", "inter_arrival", "true_mean", "proc_sigma", "gauge_sigma", "lsl", "usl"}
+
+DEFAULT_FACTORS = [
+    "Assembly.ct_mean=1.0:1.4",
+    "Assembly.mtbf=100:300",
+    "Assembly.capacity=1,2",
+    "rework_limit=0,1,2",
+]
+
+
+# FACTOR SPECS
+def parse_factor(spec):
+    """
+    "Station.param=lo:hi" (continuous range) or "param=a,b,c" (fixed levels)
+    → (name, (lo, hi)) or (name, [a, b, c]).
+    """
+    name, _, values = spec.partition("=")
+    station, _, param = name.rpartition(".")
+    if station:
+        if station not in simulation.STATIONS or param not in simulation.STATIONS[station]:
+            raise ValueError(f"unknown station parameter: {name}")
+    elif param not in LINE_PARAMS:
+        raise ValueError(f"unknown line parameter: {name}")
+    if ":" in values:
+        lo, hi = (float(v) for v in values.split(":"))
+        return name, (lo, hi)
+    return name, [float(v) for v in values.split(",")]
+
+
+def cast(name, value):
+    return int(round(value)) if name.rpartition(".")[2] in INTEGER_PARAMS else value
+
+
+def grid_design(factors, levels=LEVELS):
+    """
+    Full factorial: `levels` evenly spaced points across every range,
+    every value of every level list.
+    """
+    axes = []
+    for name, values in factors:
+        if isinstance(values, tuple):
+            lo, hi = values
+            values = [lo + (hi - lo) * k / (levels - 1) for k in range(levels)] if levels > 1 else [lo]
+        # rounding integer parameters can make neighbouring points coincide
+        axes.append(list(dict.fromkeys(cast(name, v) for v in values)))
+    names = [name for name, _ in factors]
+    return [dict(zip(names, point)) for point in itertools.product(*axes)]
+
+
+def lhs_design(factors, samples=SAMPLES, seed=BASE_SEED):
+    """
+    Latin hypercube: every factor's range is cut into `samples` equal strata
+    and each stratum is used exactly once, in an independent random order
+    per factor. Level lists are indexed by the same strata.
+    """
+    rng = random.Random(seed)
+    points = [{} for _ in range(samples)]
+    for name, values in factors:
+        strata = list(range(samples))
+        rng.shuffle(strata)
+        for point, k in zip(points, strata):
+            u = (k + rng.random()) / samples
+            if isinstance(values, tuple):
+                lo, hi = values
+                point[name] = cast(name, lo + (hi - lo) * u)
+            else:
+                point[name] = cast(name, values[min(int(u * len(values)), len(values) - 1)])
+    return points
+
+
+def line_config(point):
+    """
+    LineModel keyword arguments for one design point.
+    """
+    stations = copy.deepcopy(simulation.STATIONS)
+    config = {"stations": stations}
+    for name, value in point.items():
+        station, _, param = name.rpartition(".")
+        if station:
+            stations[station][param] = value
+        else:
+            config[param] = value
+    return config
+
+
+#                           SWEEP RUNNER
+def run_scenario(job):
+    """
+    Runs one (scenario, replication) pair in a worker process.
+    """
+    scenario, point, seed, shift_min = job
+    kpi = simulation.simulate(seed, shift_min, **line_config(point))
+    return scenario, kpi_row(kpi)
+
+
+def run_sweep(points, reps=REPS, workers=None, base_seed=BASE_SEED, shift_min=None, confidence=CONFIDENCE,
+              metric=TARGET_METRIC, baseline=0, common=True):
+    """
+    Runs every design point for replications 0..reps-1 across a process pool.
+    Replication r uses the same seed in every scenario (common random
+    numbers: each source of randomness gets the same draws), so differences
+    between scenarios are not drowned out by differences in their random
+    draws. common=False gives every scenario its own seeds instead.
+    Returns one row per scenario: the factor values, the mean and CI
+    half-width of every KPI, and the paired difference in `metric` from the
+    baseline scenario.
+    """
+    if reps < 2:
+        raise ValueError("a confidence interval needs at least 2 replications per scenario")
+    if not 0 <= baseline < len(points):
+        raise ValueError(f"baseline scenario {baseline} is not one of the {len(points)} scenarios")
+    workers = workers or os.cpu_count() or 1
+    jobs = [(i, point, replication_seed(base_seed if common else f"{base_seed}:{i}", r), shift_min)
+            for i, point in enumerate(points) for r in range(reps)]
+    results = [[] for _ in points]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        for scenario, row in pool.map(run_scenario, jobs, chunksize=chunksize):
+            results[scenario].append(row)
+
+    table = []
+    for i, (point, rows) in enumerate(zip(points, results)):
+        row = {"scenario": i, **point, "reps": len(rows)}
+        for name, (mean, hw) in summarize(rows, confidence).items():
+            row[name] = mean
+            row[f"{name}_hw"] = hw
+        # replication r of both scenarios ran on the same draws: compare them pairwise
+        diffs = [a[metric] - b[metric] for a, b in zip(rows, results[baseline])]
+        row[f"diff_{metric}"], row[f"diff_{metric}_hw"] = confidence_interval(diffs, confidence)
+        table.append(row)
+    return table
+
+
+def save_table(path, table):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(table[0]))
+        writer.writeheader()
+        writer.writerows(table)
+
+
+#                           RUN MAIN PROGRAM
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep of the QC line")
+    parser.add_argument("factors", nargs="*", default=DEFAULT_FACTORS,
+                        help='e.g. "Assembly.ct_mean=1.0:1.4" "Cutting.capacity=1,2" "rework_limit=0,1,2"')
+    parser.add_argument("--design", choices=["grid", "lhs"], default="grid")
+    parser.add_argument("--levels", type=int, default=LEVELS, help="grid points per range (grid design)")
+    parser.add_argument("--samples", type=int, default=SAMPLES, help="number of scenarios (lhs design)")
+    parser.add_argument("--reps", type=int, default=REPS, help="replications per scenario")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=BASE_SEED)
+    parser.add_argument("--shift-min", type=float, default=simulation.SHIFT_MIN, help="simulated minutes per replication")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--metric", default=TARGET_METRIC, help="KPI compared against the baseline scenario")
+    parser.add_argument("--baseline", type=int, default=0, help="scenario the others are compared with")
+    parser.add_argument("--independent", action="store_true",
+                        help="give every scenario its own seeds instead of common random numbers")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    if args.reps < 2:
+        parser.error("--reps must be at least 2: a confidence interval needs two replications")
+    factors = [parse_factor(spec) for spec in args.factors]
+    if args.design == "grid":
+        points = grid_design(factors, args.levels)
+    else:
+        points = lhs_design(factors, args.samples, args.seed)
+    if not 0 <= args.baseline < len(points):
+        parser.error(f"--baseline must be a scenario number from 0 to {len(points) - 1}")
+
+    started = time.perf_counter()
+    table = run_sweep(points, args.reps, args.workers, args.seed, args.shift_min, args.confidence,
+                      args.metric, args.baseline, not args.independent)
+    elapsed = time.perf_counter() - started
+    save_table(args.output, table)
+
+    names = [name for name, _ in factors]
+    print(f"\n====== {len(table)} SCENARIOS × {args.reps} REPLICATIONS ({args.design}) ======")
+    print(f"Best {args.metric} (difference from scenario {args.baseline}):")
+    for row in sorted(table, key=lambda r: r[args.metric], reverse=True)[:5]:
+        setting = ", ".join(f"{n}={row[n]:g}" for n in names)
+        print(f" - {row[args.metric]:.3f} ± {row[args.metric + '_hw']:.3f}  "
+              f"({row['diff_' + args.metric]:+.3f} ± {row['diff_' + args.metric + '_hw']:.3f})  |  {setting}")
+    runs = len(table) * args.reps
+    print(f"{runs} runs on {args.workers} workers in {elapsed:.2f}s ({runs / elapsed:.1f} runs/s)")
+    print(f"Saved results → {args.output}")
@@ -0,0 +1,34 @@
+import csv
+
+import pytest
+
+from streaming import InspectionWriter
+
+
+RECORDS = [(1, 0, 10.01), (2, 1, 9.98), (3, 2.5, 10.03)]  # integer times, as for the first parts
+
+
+def test_csv_writer_streams_every_record(tmp_path):
+    path = tmp_path / "inspection.csv"
+    with InspectionWriter(str(path), buffer_rows=2) as writer:
+        for record in RECORDS:
+            writer.write(*record)
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == list(InspectionWriter.FIELDS)
+    assert [(int(a), float(b), float(c)) for a, b, c in rows[1:]] == RECORDS
+    assert writer.written == len(RECORDS)
+
+
+def test_parquet_writer_keeps_the_schema_across_buffers(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "inspection.parquet"
+    # buffer_rows=2: the first row group has only integer times
+    with InspectionWriter(str(path), buffer_rows=2) as writer:
+        for record in RECORDS:
+            writer.write(*record)
+    table = pq.read_table(path)
+    assert str(table.schema.field("time").type) == "double"
+    assert str(table.schema.field("part_id").type) == "int64"
+    assert list(zip(*(table.column(name).to_pylist() for name in InspectionWriter.FIELDS))) == RECORDS
+    assert pq.ParquetFile(path).num_row_groups == 2
@@ -1,24 +1,663 @@
+# Merges every PDF in a folder, oldest first, into one PDF.
+#
+#   python Merge_PDFs.py                       # streaming merge of pdf_folder
+#   python Merge_PDFs.py --append              # add only the files that are new since the last merge
+#   python Merge_PDFs.py --max-mb 200          # split the output into volumes of about 200 MB
+#   python Merge_PDFs.py --mode memory         # the original all-in-memory merge
+#
+# stream mode writes each input's pages to the output as soon as that input
+# has been read, one input open at a time, so memory stays at about the
+# largest single input however big the folder is. Only the object offsets
+# and page numbers are kept until the end, for the cross-reference table and
+# the page tree.
+#
+# Duplicates are dropped on the way: a file with the same bytes as one
+# already merged is skipped, and so is a page whose content and resources
+# hash the same as a page of a different file already merged (--keep-duplicates
+# turns both off). Pages repeated within one file, such as blank separators
+# or a form used twice, are always kept. The dropped pages are listed per file.
+# Fonts, images and other resources that are identical across inputs are
+# written once per output file and shared.
+#
+# --max-pages / --max-mb split the output into volumes (MergedOutput_001.pdf,
+# ...). A volume is closed at the first page boundary that reaches a limit,
+# so with --max-mb it can run over by up to one page.
+#
+# Each merge leaves a manifest next to the output (<output>.manifest.json)
+# listing the merged files and volumes. With --append, the files not in the
+# manifest are added to the last volume as a PDF incremental update: their
+# pages, a new page tree and a new cross-reference section go after the
+# existing bytes, which are left as they are. If a merged file was changed
+# or removed, the limits changed, or an output file no longer matches the
+# manifest, the output is rebuilt instead.
+import argparse
+import hashlib
+import json
 import os
-import mimetypes
-from PyPDF2 import PdfMerger
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import ArrayObject, IndirectObject, NameObject, StreamObject
+except ImportError:  # PyPDF2 3.x has the same reader and object classes
+    from PyPDF2 import PdfReader, PdfWriter
+    from PyPDF2.generic import ArrayObject, IndirectObject, NameObject, StreamObject
 
 pdf_folder = r"/Users/AH0514/OneDrive - Mubea/Documents/PowerAutomatePDFs"
 merged_pdf_path = r"/Users/AH0514/OneDrive - Mubea/Documents/PowerAutomatePDFs/MergedOutput.pdf"
 
-# Get list of PDF files in the folder
-pdf_files = [f for f in os.listdir(pdf_folder)
-             if mimetypes.guess_type(os.path.join(pdf_folder, f))[0] == 'application/pdf']
-pdf_files.sort(key=lambda x: os.path.getctime(os.path.join(pdf_folder, x)))
+HEADER_WORKERS = 8
+HEADER_BYTES = 1024  # readers accept junk before %PDF- within the first 1 KB
+HASH_CHUNK = 1 << 20
+CATALOG_ID = 1
+PAGES_ID = 2
+INHERITED = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")  # page attributes a Pages node can supply
+# Besides streams (images, font files, forms), dictionaries of these types are
+# shared between inputs when identical. Annotations and the like are never
+# shared, since each belongs to one page.
+SHARED_TYPES = {"/Font", "/FontDescriptor", "/Encoding", "/ExtGState", "/Pattern", "/Shading"}
+# What a page looks like; bookkeeping such as /StructParents, /Tabs or
+# /LastModified doesn't stop two pages counting as duplicates
+PAGE_CONTENT_KEYS = ("/Contents", "/Resources", "/MediaBox", "/CropBox", "/Rotate", "/UserUnit", "/Group", "/Annots")
 
-# Initialize the merger
-merger = PdfMerger()
 
-# Append all PDFs
-for pdf in pdf_files:
-    merger.append(os.path.join(pdf_folder, pdf))
+def pdf_version(path):
+    # Header version ("1.7") if the file starts like a PDF, else None
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+    except OSError:
+        return None
+    start = head.find(b"%PDF-")
+    if start < 0:
+        return None
+    return head[start + 5:start + 8].decode("ascii", "replace")
 
-# Write out the merged PDF
-merger.write(merged_pdf_path)
-merger.close()
+def list_pdfs(folder, exclude=(), workers=HEADER_WORKERS):
+    # [(path, stat, header version)] of the PDFs in folder, oldest first.
+    # scandir's entries carry their stat, so each file is stat'ed once, and
+    # the headers are read in parallel (it is I/O bound on network drives).
+    entries = [entry for entry in os.scandir(folder)
+               if entry.is_file() and os.path.abspath(entry.path) not in exclude]
+    stats = [entry.stat() for entry in entries]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        versions = list(executor.map(pdf_version, [entry.path for entry in entries]))
+    files = [(entry.path, st, version) for entry, st, version in zip(entries, stats, versions) if version]
+    files.sort(key=lambda item: item[1].st_ctime)
+    return files
 
-print(f"Merged PDF saved at: {merged_pdf_path}")
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_same_sized(files, known_sizes=(), workers=HEADER_WORKERS):
+    # {path: sha256} for the files that share their size with another file
+    # (or with a file merged earlier); any other file can't be a byte-for-byte copy
+    sizes = {}
+    for path, st, _ in files:
+        sizes.setdefault(st.st_size, []).append(path)
+    paths = [path for size, group in sizes.items() if len(group) > 1 or size in known_sizes for path in group]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(file_hash, paths)))
+
+
+class SourceDocument:
+    # One input being copied. Objects are hashed by content, with references
+    # hashed as the content they point to, so identical resources and pages
+    # in different files get the same digest.
+    def __init__(self, reader):
+        self.reader = reader
+        self.pages = list(reader.pages)
+        self.page_keys = {_key(page.indirect_reference) for page in self.pages}
+        self.dropped = set()  # keys of duplicate pages that are left out
+        self._digests = {}
+        self._visiting = set()
+
+    def page_copy(self, page):
+        # The page's own entries plus the ones it inherits, without /Parent
+        copy = {key: value for key, value in page.items() if key != "/Parent"}
+        for key in INHERITED:
+            if key not in copy:
+                value = _inherited(page, key)
+                if value is not None:
+                    copy[key] = value
+        return copy
+
+    def page_digest(self, page):
+        copy = self.page_copy(page)
+        return self.digest({key: copy[key] for key in PAGE_CONTENT_KEYS if key in copy})
+
+    def digest(self, obj):
+        # None when obj refers to a page or is part of a reference cycle;
+        # such objects are always copied rather than shared
+        h = hashlib.sha1()
+        return h.digest() if self._feed(h, obj) else None
+
+    def digest_ref(self, reference):
+        key = _key(reference)
+        if key in self.page_keys or key in self._visiting:
+            return None
+        if key not in self._digests:
+            self._visiting.add(key)
+            target = reference.get_object()
+            self._digests[key] = b"pages" if _is_page_tree(target) else self.digest(target)
+            self._visiting.discard(key)
+        return self._digests[key]
+
+    def _feed(self, h, obj):
+        if isinstance(obj, IndirectObject):
+            digest = self.digest_ref(obj)
+            if digest is None:
+                return False
+            h.update(b"R" + digest)
+        elif isinstance(obj, dict):
+            h.update(b"<<")
+            for key, value in sorted(obj.items()):
+                if key == "/Length" and isinstance(obj, StreamObject):
+                    continue
+                h.update(key.encode("utf-8") + b" ")
+                if not self._feed(h, value):
+                    return False
+            h.update(b">>")
+            if isinstance(obj, StreamObject):
+                h.update(b"stream %d " % len(obj._data))
+                h.update(obj._data)
+        elif isinstance(obj, ArrayObject):
+            h.update(b"[")
+            for value in obj:
+                if not self._feed(h, value):
+                    return False
+            h.update(b"]")
+        else:
+            buffer = BytesIO()
+            obj.write_to_stream(buffer, None)
+            h.update(buffer.getvalue() + b" ")
+        return True
+
+
+class OutputError(OSError):
+    # Writing the merged output failed. Unlike an unreadable input, this
+    # stops the merge: every later input would fail the same way.
+    pass
+
+
+def _open_output(path, mode):
+    try:
+        return open(path, mode)
+    except OSError as e:
+        raise OutputError(f"can't open {path}: {e}") from e
+
+
+class StreamingPdfWriter:
+    # Writes pages from many readers straight into one file. Objects get new
+    # numbers as they are reached from a page; each is written once and only
+    # its offset is kept.
+    def __init__(self, f, next_id, offset, share=True):
+        self.f = f
+        self.position = offset
+        self.next_id = next_id
+        self.offsets = {}
+        self.share = share
+        self.shared = {}  # content digest → object number, for resources used by several inputs
+        self.shared_objects = 0
+        self.shared_bytes = 0
+        self._doc = None
+        self._mapping = {}  # (idnum, generation) in the current document → number here
+        self._pending = []
+
+    def _out(self, data):
+        try:
+            self.f.write(data)
+        except OSError as e:
+            raise OutputError(f"can't write {self.f.name}: {e}") from e
+        self.position += len(data)
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def write_object(self, number, obj, ref=None):
+        self.offsets[number] = self.position
+        self._out(b"%d 0 obj\n" % number)
+        self._serialize(obj, ref)
+        self._out(b"\nendobj\n")
+
+    def _serialize(self, obj, ref):
+        # Like obj.write_to_stream, but with indirect references renumbered by ref
+        if isinstance(obj, OutputRef):
+            self._out(b"%d 0 R" % obj.number)
+        elif isinstance(obj, IndirectObject):
+            number = ref(obj)
+            self._out(b"null" if number is None else b"%d 0 R" % number)
+        elif isinstance(obj, dict):
+            data = obj._data if isinstance(obj, StreamObject) else None  # raw, still-encoded stream bytes
+            self._out(b"<<")
+            for key, value in obj.items():
+                if data is not None and key == "/Length":
+                    continue
+                self._out(b"\n")
+                self._serialize(NameObject(key), ref)
+                self._out(b" ")
+                self._serialize(value, ref)
+            if data is not None:
+                self._out(b"\n/Length %d" % len(data))
+            self._out(b"\n>>")
+            if data is not None:
+                self._out(b"\nstream\n")
+                self._out(data)
+                self._out(b"\nendstream")
+        elif isinstance(obj, ArrayObject):
+            self._out(b"[")
+            for i, value in enumerate(obj):
+                if i:
+                    self._out(b" ")
+                self._serialize(value, ref)
+            self._out(b"]")
+        else:
+            buffer = BytesIO()
+            obj.write_to_stream(buffer, None)
+            self._out(buffer.getvalue())
+
+    def _assign(self, key):
+        number = self._mapping[key] = self.new_id()
+        return number
+
+    def _ref(self, reference):
+        key = _key(reference)
+        if key in self._mapping:
+            return self._mapping[key]
+        doc = self._doc
+        if key in doc.page_keys:
+            # A link to another page: it gets its number now and is written
+            # when its turn comes. Pages left out, or in another volume, stay
+            # unwritten, and readers treat a reference to them as null.
+            return None if key in doc.dropped else self._assign(key)
+        target = reference.get_object()
+        if _is_page_tree(target):
+            return PAGES_ID  # never copy the source's page tree; point at ours
+        if self.share and _shareable(target):
+            digest = doc.digest_ref(reference)
+            if digest is not None and digest in self.shared:
+                self._mapping[key] = self.shared[digest]
+                self.shared_objects += 1
+                self.shared_bytes += len(target._data) if isinstance(target, StreamObject) else 0
+                return self._mapping[key]
+            if digest is not None:
+                self.shared[digest] = self._assign(key)
+                self._pending.append((self._mapping[key], target))
+                return self._mapping[key]
+        self._pending.append((self._assign(key), target))
+        return self._mapping[key]
+
+    def add_page(self, doc, page):
+        # Writes page and everything it uses that isn't in this file yet;
+        # returns its number
+        if doc is not self._doc:
+            self._doc, self._mapping = doc, {}
+        key = _key(page.indirect_reference)
+        number = self._mapping.get(key) or self._assign(key)
+        copy = doc.page_copy(page)
+        copy["/Parent"] = OutputRef(PAGES_ID)
+        self.write_object(number, copy, self._ref)
+        while self._pending:
+            self.write_object(*self._pending.pop(), self._ref)
+        return number
+
+    def write_page_tree(self, page_ids):
+        kids = b" ".join(b"%d 0 R" % number for number in page_ids)
+        self.offsets[PAGES_ID] = self.position
+        self._out(b"%d 0 obj\n<< /Type /Pages /Kids [%s] /Count %d >>\nendobj\n"
+                  % (PAGES_ID, kids, len(page_ids)))
+
+    def write_xref(self, prev=None):
+        # One subsection per run of consecutive object numbers; numbers that
+        # were handed out but never written (an input that failed half way,
+        # a link to a page that was left out) are listed as free
+        start = self.position
+        numbers = sorted(self.offsets)
+        lines = [b"xref\n"]
+        if prev is None:
+            numbers = list(range(1, self.next_id))
+            lines.append(b"0 %d\n0000000000 65535 f \n" % self.next_id)
+        runs = []
+        for number in numbers:
+            if runs and number == runs[-1][-1] + 1:
+                runs[-1].append(number)
+            else:
+                runs.append([number])
+        for run in runs:
+            if prev is not None:
+                lines.append(b"%d %d\n" % (run[0], len(run)))
+            for number in run:
+                offset = self.offsets.get(number)
+                lines.append(b"%010d 00000 n \n" % offset if offset is not None else b"0000000000 00001 f \n")
+        trailer = b"/Size %d /Root %d 0 R" % (self.next_id, CATALOG_ID)
+        if prev is not None:
+            trailer += b" /Prev %d" % prev
+        lines.append(b"trailer\n<< %s >>\nstartxref\n%d\n%%%%EOF\n" % (trailer, start))
+        self._out(b"".join(lines))
+        return start
+
+
+class VolumeSet:
+    # The merged output: one file, or volumes of at most max_pages pages /
+    # about max_bytes bytes. volumes are manifest entries from the last
+    # merge; the last one is reopened and appended to while it has room.
+    def __init__(self, output, version="1.4", max_pages=None, max_bytes=None, share=True, volumes=()):
+        self.output = output
+        self.version = version
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.share = share
+        self.volumes = [dict(volume) for volume in volumes]
+        self.written = 0
+        self.shared_objects = 0
+        self.shared_bytes = 0
+        self._writer = None
+        self._file = None
+        self._volume = None
+        self._reopen = bool(self.volumes)
+
+    def path(self, index):
+        if not self.max_pages and not self.max_bytes:
+            return self.output
+        base, ext = os.path.splitext(self.output)
+        return f"{base}_{index + 1:03d}{ext}"
+
+    def _full(self, volume, size):
+        return ((self.max_pages and len(volume["page_ids"]) >= self.max_pages)
+                or (self.max_bytes and size >= self.max_bytes))
+
+    def _open(self):
+        last = self.volumes[-1] if self._reopen else None
+        self._reopen = False
+        if last is not None and not self._full(last, last["size"]):
+            self._file = _open_output(os.path.join(os.path.dirname(self.output), last["name"]), "ab")
+            self._volume = last
+            self._writer = StreamingPdfWriter(self._file, last["next_id"], last["size"], self.share)
+            self._start = last["size"]
+            return
+        path = self.path(len(self.volumes))
+        self._file = _open_output(path, "wb")
+        # listed only once the file exists, so every volume gets a size on close
+        self._volume = {"name": os.path.basename(path), "page_ids": []}
+        self.volumes.append(self._volume)
+        self._writer = StreamingPdfWriter(self._file, PAGES_ID + 1, 0, self.share)
+        self._start = 0
+        self._writer._out(b"%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n" % self.version.encode("ascii"))
+        self._writer.offsets[CATALOG_ID] = self._writer.position
+        self._writer._out(b"%d 0 obj\n<< /Type /Catalog /Pages %d 0 R >>\nendobj\n" % (CATALOG_ID, PAGES_ID))
+
+    def _close(self):
+        if self._writer is None:
+            return
+        writer, volume = self._writer, self._volume
+        try:
+            # Appending redefines object PAGES_ID; readers use the newest definition
+            writer.write_page_tree(volume["page_ids"])
+            volume["startxref"] = writer.write_xref(prev=volume.get("startxref"))
+        finally:
+            try:
+                self._file.close()  # flushes the last buffered bytes
+            except OSError as e:
+                raise OutputError(f"can't write {self._file.name}: {e}") from e
+        volume["size"] = writer.position
+        volume["next_id"] = writer.next_id
+        self.written += writer.position - self._start
+        self.shared_objects += writer.shared_objects
+        self.shared_bytes += writer.shared_bytes
+        self._writer = self._file = self._volume = None
+
+    def add_page(self, doc, page):
+        if self._writer is None or self._full(self._volume, self._writer.position):
+            self._close()
+            self._open()
+        self._volume["page_ids"].append(self._writer.add_page(doc, page))
+
+    def close(self):
+        self._close()
+        return self.volumes
+
+
+class OutputRef:
+    # A reference that is already numbered in the output
+    def __init__(self, number):
+        self.number = number
+
+
+def _key(reference):
+    return reference.idnum, reference.generation
+
+def _is_page_tree(obj):
+    return isinstance(obj, dict) and obj.get("/Type") == "/Pages"
+
+def _shareable(obj):
+    return isinstance(obj, StreamObject) or (isinstance(obj, dict) and obj.get("/Type") in SHARED_TYPES)
+
+def _inherited(page, key):
+    node = page.get("/Parent")
+    while node is not None:
+        node = node.get_object()
+        if key in node:
+            return node.raw_get(key)
+        node = node.get("/Parent")
+    return None
+
+
+def manifest_path(output):
+    return output + ".manifest.json"
+
+def read_manifest(output):
+    try:
+        with open(manifest_path(output), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_manifest(output, max_pages=None, max_bytes=None):
+    # The last merge's manifest, if the output can still be appended to
+    manifest = read_manifest(output)
+    if manifest is None or "volumes" not in manifest:
+        return None
+    if (manifest.get("max_pages"), manifest.get("max_bytes")) != (max_pages, max_bytes):
+        return None
+    folder = os.path.dirname(output)
+    for volume in manifest["volumes"]:
+        path = os.path.join(folder, volume["name"])
+        if not os.path.exists(path) or os.path.getsize(path) != volume["size"]:
+            return None  # output changed since the manifest was written
+    return manifest
+
+def file_record(path, st, pages):
+    return {"name": os.path.basename(path), "size": st.st_size, "mtime": st.st_mtime, "pages": pages}
+
+def merge_streaming(files, output, append=False, max_pages=None, max_bytes=None, dedupe=True,
+                    workers=HEADER_WORKERS):
+    # Returns (manifest, files added, whether an existing output was extended, report)
+    started = time.perf_counter()
+    previous = read_manifest(output)
+    manifest = load_manifest(output, max_pages, max_bytes) if append else None
+    if manifest is not None:
+        current = {os.path.basename(path): file_record(path, st, None) for path, st, _ in files}
+        unchanged = []
+        for record in manifest["files"]:
+            seen = current.get(record["name"])
+            if seen is not None and (seen["size"], seen["mtime"]) == (record["size"], record["mtime"]):
+                unchanged.append(record)
+            elif "error" not in record:  # a file that failed before is just tried again
+                print(f"{record['name']} changed or was removed since the last merge; rebuilding")
+                manifest = None
+                break
+    appending = manifest is not None
+    records = unchanged if appending else []
+    hashes = hash_same_sized(files, {record["size"] for record in records}, workers) if dedupe else {}
+    paths = {os.path.basename(path): path for path, _, _ in files}
+    for record in records:
+        if paths.get(record["name"]) in hashes:
+            record["sha256"] = hashes[paths[record["name"]]]
+    file_hashes = {record["sha256"]: record["name"] for record in records if "sha256" in record}
+    # page hash → name of the first file it was merged from
+    page_hashes = {}
+    if appending:
+        known = manifest.get("page_hashes", {})
+        # manifests written before the file names were recorded list bare hashes
+        page_hashes = dict(known) if isinstance(known, dict) else dict.fromkeys(known)
+    report = {"input_bytes": 0, "duplicate_files": 0, "duplicate_file_bytes": 0,
+              "duplicate_pages": 0, "dropped_pages": {}, "pages": 0}
+    if appending:
+        done = {record["name"] for record in records}
+        files = [item for item in files if os.path.basename(item[0]) not in done]
+        if not files:
+            return manifest, [], True, None
+    version = max((v for _, _, v in files), default="1.4")
+    volumes = VolumeSet(output, version, max_pages, max_bytes, share=dedupe,
+                        volumes=manifest["volumes"] if appending else ())
+    added = []
+    try:
+        for path, st, _ in files:
+            report["input_bytes"] += st.st_size
+            digest = hashes.get(path)
+            if digest in file_hashes:
+                records.append(dict(file_record(path, st, 0), sha256=digest, duplicate_of=file_hashes[digest]))
+                report["duplicate_files"] += 1
+                report["duplicate_file_bytes"] += st.st_size
+                continue
+            copied = 0
+            name = os.path.basename(path)
+            dropped = []
+            try:
+                with open(path, "rb") as f:  # a file handle, so pypdf reads objects on demand
+                    reader = PdfReader(f)
+                    if reader.is_encrypted:
+                        reader.decrypt("")
+                    doc = SourceDocument(reader)
+                    own_hashes = set()
+                    for number, page in enumerate(doc.pages, 1):
+                        page_hash = doc.page_digest(page) if dedupe else None
+                        if page_hash is None:
+                            continue
+                        page_hash = page_hash.hex()
+                        if page_hash in page_hashes:  # only ever holds pages of other files
+                            doc.dropped.add(_key(page.indirect_reference))
+                            dropped.append({"page": number, "duplicate_of": page_hashes[page_hash]})
+                        else:
+                            own_hashes.add(page_hash)
+                    page_hashes.update(dict.fromkeys(own_hashes, name))
+                    for page in doc.pages:
+                        if _key(page.indirect_reference) not in doc.dropped:
+                            volumes.add_page(doc, page)
+                            copied += 1
+            except OutputError:
+                raise
+            except Exception as e:  # one unreadable file shouldn't stop the merge
+                error = f"{type(e).__name__}: {e}"
+                print(f"Skipping {name}: {error}")
+                if not copied:
+                    # kept in the manifest so --append doesn't retry it until it changes
+                    records.append(dict(file_record(path, st, 0), error=error))
+                    continue
+            record = file_record(path, st, copied)
+            if digest is not None:
+                record["sha256"] = digest
+                file_hashes[digest] = record["name"]
+            if dropped:
+                record["dropped_pages"] = dropped
+                report["dropped_pages"][name] = dropped
+                report["duplicate_pages"] += len(dropped)
+            records.append(record)
+            report["pages"] += copied
+            added.append(path)
+    finally:
+        volume_list = volumes.close()
+    report.update(output_bytes=volumes.written, shared_objects=volumes.shared_objects,
+                  shared_bytes=volumes.shared_bytes, seconds=round(time.perf_counter() - started, 3))
+    manifest = {"max_pages": max_pages, "max_bytes": max_bytes, "volumes": volume_list,
+                "files": records, "page_hashes": dict(sorted(page_hashes.items())), "report": report}
+    with open(manifest_path(output), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    if previous and not appending:
+        # volumes a bigger earlier merge left behind
+        names = {volume["name"] for volume in volume_list}
+        for volume in previous.get("volumes", ()):
+            path = os.path.join(os.path.dirname(output), volume["name"])
+            if volume["name"] not in names and os.path.exists(path):
+                os.remove(path)
+    return manifest, added, appending, report
+
+
+def merge_in_memory(files, output):
+    # The original approach: every input held in one writer until the end.
+    # Returns the number of files merged.
+    writer = PdfWriter()
+    merged = 0
+    for path, _, _ in files:
+        try:
+            writer.append(path)
+            merged += 1
+        except Exception as e:
+            print(f"Skipping {os.path.basename(path)}: {type(e).__name__}: {e}")
+    with open(output, "wb") as f:
+        writer.write(f)
+    writer.close()
+    return merged
+
+
+def describe(report):
+    mb = 1024 * 1024
+    saved = report["duplicate_file_bytes"] + report["shared_bytes"]
+    lines = [
+        f"  input {report['input_bytes'] / mb:.1f} MB → output {report['output_bytes'] / mb:.1f} MB "
+        f"in {report['seconds']:.2f}s",
+        f"  duplicate files skipped: {report['duplicate_files']} ({report['duplicate_file_bytes'] / mb:.1f} MB)",
+        f"  duplicate pages dropped: {report['duplicate_pages']}",
+    ]
+    for name, dropped in report["dropped_pages"].items():
+        pages = ", ".join(f"{d['page']} (= {d['duplicate_of'] or 'an earlier merge'})" for d in dropped)
+        lines.append(f"    {name}: page {pages}")
+    lines += [
+        f"  shared resources: {report['shared_objects']} references to objects already written "
+        f"({report['shared_bytes'] / mb:.1f} MB of streams)",
+        f"  saved about {saved / mb:.1f} MB, not counting dropped pages",
+    ]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the PDFs in a folder, oldest first")
+    parser.add_argument("--folder", default=pdf_folder)
+    parser.add_argument("--output", default=merged_pdf_path)
+    parser.add_argument("--mode", choices=("stream", "memory"), default="stream")
+    parser.add_argument("--append", action="store_true",
+                        help="add only the files not in the last merge's manifest (stream mode)")
+    parser.add_argument("--max-pages", type=int, help="split the output into volumes of at most this many pages")
+    parser.add_argument("--max-mb", type=float, help="split the output into volumes of about this size")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="merge repeated files and pages, and don't share identical resources")
+    parser.add_argument("--workers", type=int, default=HEADER_WORKERS, help="threads checking and hashing files")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    output = os.path.abspath(args.output)
+    exclude = {output} | {os.path.join(os.path.dirname(output), volume["name"])
+                          for volume in (read_manifest(output) or {}).get("volumes", ())}
+    pdf_files = list_pdfs(args.folder, exclude=exclude, workers=args.workers)
+    if args.mode == "memory":
+        merged = merge_in_memory(pdf_files, output)
+        print(f"Merged {merged} PDFs in {time.perf_counter() - started:.2f}s")
+        print(f"Merged PDF saved at: {output}")
+    else:
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+        manifest, added, appended, report = merge_streaming(
+            pdf_files, output, args.append, args.max_pages, max_bytes, not args.keep_duplicates, args.workers)
+        action = "Appended" if appended else "Merged"
+        pages = sum(len(volume["page_ids"]) for volume in manifest["volumes"])
+        print(f"{action} {len(added)} PDFs ({pages} pages in total) in {time.perf_counter() - started:.2f}s")
+        if report:
+            print(describe(report))
+        for volume in manifest["volumes"]:
+            print(f"Merged PDF saved at: {os.path.join(os.path.dirname(output), volume['name'])} "
+                  f"({len(volume['page_ids'])} pages, {volume['size'] / 1024 / 1024:.1f} MB)")
@@ -1,10 +1,35 @@
+import asyncio
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 from search import search_chunks
+from store import ChunkStore
+from cache import QueryCache, AnswerCache, search_key
 
 load_dotenv()
+# Set ANTHROPIC_BASE_URL=http://127.0.0.1:8765 to run against stub_llm.py offline
 client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+async_client = AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+LLM_MODEL = "claude-sonnet-4-5"
+MAX_TOKENS = 300
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "request_metrics.jsonl")
+_metrics_lock = threading.Lock()
+# Shared by every caller in the process (all Streamlit sessions). The answer
+# cache opens its SQLite file on first use, so importing this module creates nothing
+query_cache = QueryCache()
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache():
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache()
+    return _answer_cache
 
 def build_prompt(query, retrieved_chunks):
     context = "\n\n".join([
@@ -26,31 +51,169 @@ Question: {query}
 Answer:"""
     return prompt
 
-def ask_claude(query, chunks, top_k=5):
-    retrieved_chunks = search_chunks(query, chunks, top_k=top_k)
-    prompt = build_prompt(query, retrieved_chunks)
+def also_in(source):
+    ''' Other places a source's text appears (near-duplicates merged at ingest) '''
+    others = source.get('also_in') or []
+    if not others:
+        return ""
+    return "; also in " + ", ".join(f"{o['filename']} p{o['page_number']}" for o in others)
+
+def retrieve_for(query, chunks, top_k, index, mode, use_cache):
+    ''' Retrieval half of a request. Returns (sources, cached answer or None,
+    cache key to store the new answer under, or None when not caching) '''
+    if not use_cache:
+        return search_chunks(query, chunks, top_k=top_k, index=index, mode=mode), None, None
+
+    # Repeated or near-identical questions against an unchanged corpus are
+    # answered from the cache without retrieval or an LLM call
+    store = ChunkStore.from_chunks(chunks)
+    query_embedding = query_cache.embed(query)
+    settings = search_key(store, index, mode)
+    cached = get_answer_cache().lookup(query_embedding, store.version, top_k, settings)
+    if cached is not None:
+        answer, sources, _, _ = cached
+        return sources, answer, None
+    sources = query_cache.retrieve(query, store, top_k, index=index, mode=mode)
+    return sources, None, (store.version, top_k, settings, query_embedding)
+
+def remember(query, cache_key, answer, sources, latency_seconds):
+    if cache_key is not None:
+        version, top_k, settings, query_embedding = cache_key
+        get_answer_cache().store(query, query_embedding, version, top_k, settings, answer, sources, latency_seconds)
 
+def ask_claude(query, chunks, top_k=5, index=None, mode="dense", use_cache=True):
+    metrics = RequestMetrics(query, streamed=False)
+    sources, answer, cache_key = retrieve_for(query, chunks, top_k, index, mode, use_cache)
+    metrics.retrieved()
+    if answer is None:
+        answer = call_claude(build_prompt(query, sources))
+        remember(query, cache_key, answer, sources, metrics.elapsed())
+    else:
+        metrics.cached = True
+    metrics.first_token()  # a blocking call gets the whole answer at once
+    metrics.finish(answer)
+    return answer, sources
+
+def call_claude(prompt):
     response = client.messages.create(
-        model="claude-sonnet-4-5",
-        max_tokens=300,
+        model=LLM_MODEL,
+        max_tokens=MAX_TOKENS,
         messages=[{"role": "user", "content": prompt}]
     )
+    return response.content[0].text
+
+def ask_claude_stream(query, chunks, top_k=5, index=None, mode="dense", use_cache=True):
+    ''' Streaming version of ask_claude. Retrieval runs immediately; returns
+    (token iterator, sources, metrics). The answer is generated while the
+    iterator is consumed, and metrics are filled in as tokens arrive. '''
+    metrics = RequestMetrics(query, streamed=True)
+    sources, cached, cache_key = retrieve_for(query, chunks, top_k, index, mode, use_cache)
+    metrics.retrieved()
+
+    def tokens():
+        if cached is not None:
+            metrics.cached = True
+            metrics.first_token()
+            yield cached
+            metrics.finish(cached)
+            return
+        pieces = []
+        with client.messages.stream(
+            model=LLM_MODEL,
+            max_tokens=MAX_TOKENS,
+            messages=[{"role": "user", "content": build_prompt(query, sources)}]
+        ) as stream:
+            for text in stream.text_stream:
+                if not pieces:
+                    metrics.first_token()
+                pieces.append(text)
+                yield text
+        answer = "".join(pieces)
+        remember(query, cache_key, answer, sources, metrics.elapsed())
+        metrics.finish(answer)
+
+    return tokens(), sources, metrics
+
+async def ask_claude_async(query, chunks, top_k=5, index=None, mode="dense", use_cache=True, on_token=None):
+    ''' asyncio version for server use: retrieval runs in a worker thread so
+    the event loop stays free, and the answer is streamed from the async
+    client. on_token(text) is called for each piece as it arrives.
+    Returns (answer, sources, metrics). '''
+    metrics = RequestMetrics(query, streamed=True)
+    sources, answer, cache_key = await asyncio.to_thread(retrieve_for, query, chunks, top_k, index, mode, use_cache)
+    metrics.retrieved()
+    if answer is not None:
+        metrics.cached = True
+        metrics.first_token()
+        if on_token:
+            on_token(answer)
+    else:
+        pieces = []
+        async with async_client.messages.stream(
+            model=LLM_MODEL,
+            max_tokens=MAX_TOKENS,
+            messages=[{"role": "user", "content": build_prompt(query, sources)}]
+        ) as stream:
+            async for text in stream.text_stream:
+                if not pieces:
+                    metrics.first_token()
+                pieces.append(text)
+                if on_token:
+                    on_token(text)
+        answer = "".join(pieces)
+        await asyncio.to_thread(remember, query, cache_key, answer, sources, metrics.elapsed())
+    metrics.finish(answer)
+    return answer, sources, metrics
+
+
+class RequestMetrics:
+    ''' Per-request timings, measured from when the question came in:
+    retrieval_seconds, ttft_seconds (time to first token) and total_seconds.
+    Each finished request is appended to METRICS_PATH as one JSON line. '''
+
+    def __init__(self, query, streamed):
+        self.query = query
+        self.streamed = streamed
+        self.cached = False
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._start = time.perf_counter()
+        self.retrieval_seconds = self.ttft_seconds = self.total_seconds = None
+        self.output_chars = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def retrieved(self):
+        self.retrieval_seconds = self.elapsed()
+
+    def first_token(self):
+        if self.ttft_seconds is None:
+            self.ttft_seconds = self.elapsed()
 
-    return response.content[0].text, retrieved_chunks
+    def finish(self, answer):
+        self.total_seconds = self.elapsed()
+        self.output_chars = len(answer)
+        record = {k: v for k, v in vars(self).items() if not k.startswith('_')}
+        with _metrics_lock, open(METRICS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
 
 if __name__ == "__main__":
-    from extract import extract_all_pdfs, directory
-    from chunk import chunk_all_pages
-    from embed import embed_chunks
+    from extract import directory
+    from index import build_index, load_ann
+    from embed import preload_model
 
-    pages = extract_all_pdfs(directory)
-    chunks = chunk_all_pages(pages)
-    chunks = embed_chunks(chunks)
+    preload_model()
+    chunks = build_index(directory)
+    ann_index = load_ann()
 
     query = "What is the Bristol Local Plan Review about?"
-    answer, sources = ask_claude(query, chunks, top_k=3)
+    tokens, sources, metrics = ask_claude_stream(query, chunks, top_k=3, index=ann_index)
 
-    print("Answer:", answer)
+    print("Answer: ", end="", flush=True)
+    for text in tokens:
+        print(text, end="", flush=True)
+    first_token = "no tokens" if metrics.ttft_seconds is None else f"first token after {metrics.ttft_seconds:.2f}s"
+    print(f"\n\n({first_token}, total {metrics.total_seconds:.2f}s)")
     print("\nSources used:")
     for s in sources:
-        print(f"- {s['filename']}, page {s['page_number']} (score: {s['score']:.3f})")
\ No newline at end of file
+        print(f"- {s['filename']}, page {s['page_number']} (score: {s['score']:.3f})" + also_in(s))
\ No newline at end of file
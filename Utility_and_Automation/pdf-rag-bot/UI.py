@@ -1,30 +1,66 @@
 import streamlit as st
-from extract import extract_all_pdfs, directory
-from chunk import chunk_all_pages
-from embed import embed_chunks
-from Rag_bot import ask_claude
+from embed import preload_model
+from extract import directory
+from index import build_index, load_ann
+from Rag_bot import also_in, ask_claude_stream, query_cache, get_answer_cache
+from cache import cache_stats
+from embed_service import service_metrics
+from search import MODES
 
 st.title("PDF RAG Bot")
 
+@st.cache_resource
+def start_model_preload():
+    # Loads the embedding model in the background while the index loads,
+    # so the first question doesn't wait for it
+    return preload_model()
+
+start_model_preload()
+
 @st.cache_resource
 def load_chunks():
-    pages = extract_all_pdfs(directory)
-    chunks = chunk_all_pages(pages)
-    chunks = embed_chunks(chunks)
-    return chunks
+    return build_index(directory)
+
+@st.cache_resource
+def load_ann_index():
+    # None (exact search) until an IVF index is built with `python ann.py`
+    return load_ann()
 
 chunks = load_chunks()
+ann_index = load_ann_index()
 st.success("PDFs loaded and processed successfully!")
 
+mode = st.sidebar.selectbox("Retrieval mode", MODES, index=MODES.index("dense"),
+                            help="hybrid fuses dense similarity with BM25 keyword matching, "
+                                 "which catches exact part numbers and clause ids")
+
 query = st.text_input("Enter your question about the PDFs:")
 
 if query:
     with st.spinner("Searching for answers..."):
-        answer, sources = ask_claude(query, chunks, top_k=3)
+        tokens, sources, metrics = ask_claude_stream(query, chunks, top_k=3, index=ann_index, mode=mode)
 
+    # Tokens are shown as they arrive rather than after the whole answer
     st.subheader("Answer:")
-    st.write(answer)
+    st.write_stream(tokens)
+    # ttft_seconds stays None when the stream produced no tokens at all
+    first_token = "No tokens received" if metrics.ttft_seconds is None else f"First token after {metrics.ttft_seconds:.2f}s"
+    st.caption(f"{first_token}, complete after {metrics.total_seconds:.2f}s"
+               + (" (cached)" if metrics.cached else ""))
 
     st.subheader("Sources used:")
     for s in sources:
-        st.write(f"- {s['filename']}, page {s['page_number']} (score: {s['score']:.3f})")
\ No newline at end of file
+        st.write(f"- {s['filename']}, page {s['page_number']} (score: {s['score']:.3f})" + also_in(s))
+
+stats = cache_stats(query_cache, get_answer_cache())
+st.sidebar.subheader("Cache")
+st.sidebar.write(f"Answer hit rate: {stats['answer_hit_rate']:.0%} ({stats['answer_hits']} hits)")
+st.sidebar.write(f"Latency saved: {stats['answer_seconds_saved']:.1f}s")
+st.sidebar.write(f"Retrieval hit rate: {stats['retrieval_hit_rate']:.0%}")
+
+embed_stats = service_metrics()
+if embed_stats:
+    st.sidebar.subheader("Embedding service")
+    st.sidebar.write(f"Mean batch size: {embed_stats['mean_batch_size']:.1f} "
+                     f"(max {embed_stats['max_batch_size']})")
+    st.sidebar.write(f"Queue depth: {embed_stats['queue_depth']} (max {embed_stats['max_queue_depth']})")
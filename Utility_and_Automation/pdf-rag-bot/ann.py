@@ -0,0 +1,167 @@
+''' Nearest-neighbour indexes over the chunk embedding matrix.
+
+Every index exposes the same two methods, so search.py can swap them freely:
+    build(embeddings)                          → self
+    search(query_embeddings, embeddings, top_k) → (indices, scores), one row per query
+
+ExactIndex is the brute-force scan. IVFIndex is an inverted-file index:
+embeddings are clustered with spherical k-means and each query only scores the
+chunks in its n_probe closest clusters, trading a little recall for latency.
+'''
+import numpy as np
+
+ASSIGN_BLOCK = 65536  # rows scored against the centroids at a time while building
+
+
+def top_k_indices(scores, top_k):
+    ''' Indices of the top_k highest scores in each row, best first.
+    argpartition finds the top_k in O(n); only those k are then sorted. '''
+    scores = np.atleast_2d(scores)
+    n = scores.shape[1]
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    if top_k < n:
+        candidates = np.argpartition(scores, n - top_k, axis=1)[:, n - top_k:]
+    else:
+        candidates = np.tile(np.arange(n), (scores.shape[0], 1))
+    ranked = []
+    for row, idx in zip(scores, candidates):
+        # Score descending, ties → higher index first (same as argsort()[::-1])
+        ranked.append(idx[np.lexsort((-idx, -row[idx]))])
+    return np.array(ranked)
+
+
+class ExactIndex:
+    ''' Brute force: one matrix multiply against every embedding '''
+
+    def build(self, embeddings):
+        return self
+
+    def search(self, query_embeddings, embeddings, top_k=5):
+        query_embeddings = np.atleast_2d(query_embeddings)
+        if hasattr(embeddings, 'scores'):  # store.QuantizedMatrix scores itself block by block
+            scores = embeddings.scores(query_embeddings)
+        else:
+            scores = query_embeddings @ embeddings.T
+        indices = top_k_indices(scores, top_k)
+        return indices, np.take_along_axis(scores, indices, axis=1)
+
+
+class IVFIndex:
+    ''' Inverted-file index.
+
+    n_lists  - number of clusters; more lists = smaller lists = faster queries
+               but more chance the true neighbour sits in a list not probed
+    n_probe  - clusters scanned per query; the main recall/latency knob
+    '''
+
+    def __init__(self, n_lists=None, n_probe=16, kmeans_iters=15, train_size=None, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iters = kmeans_iters
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids = None
+        self.list_offsets = None  # CSR: list j holds list_ids[list_offsets[j]:list_offsets[j + 1]]
+        self.list_ids = None
+
+    def build(self, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n = len(embeddings)
+        rng = np.random.default_rng(self.seed)
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        # k-means only needs a sample to place the centroids
+        train_size = min(n, self.train_size or 64 * n_lists)
+        sample = embeddings[np.sort(rng.choice(n, size=train_size, replace=False))]
+        self.centroids = self._spherical_kmeans(sample, n_lists, rng)
+
+        labels = self._assign(embeddings)
+        order = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=n_lists)
+        self.list_ids = order.astype(np.int64)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return self
+
+    def _spherical_kmeans(self, sample, k, rng):
+        centroids = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind='stable')
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centroids)
+            present = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)])[present]
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            # Empty clusters are re-seeded from random sample points
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        return centroids.astype(np.float32)
+
+    def _assign(self, embeddings):
+        labels = np.empty(len(embeddings), dtype=np.int64)
+        for start in range(0, len(embeddings), ASSIGN_BLOCK):
+            block = np.asarray(embeddings[start:start + ASSIGN_BLOCK], dtype=np.float32)
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def search(self, query_embeddings, embeddings, top_k=5, n_probe=None):
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        probes = top_k_indices(query_embeddings @ self.centroids.T, n_probe)
+        all_indices = np.full((len(query_embeddings), top_k), -1, dtype=np.int64)
+        all_scores = np.full((len(query_embeddings), top_k), -np.inf, dtype=np.float32)
+        for qi, (query, lists) in enumerate(zip(query_embeddings, probes)):
+            candidates = np.sort(np.concatenate([
+                self.list_ids[self.list_offsets[j]:self.list_offsets[j + 1]] for j in lists
+            ]))
+            if len(candidates) == 0:
+                continue
+            scores = np.asarray(embeddings[candidates], dtype=np.float32) @ query
+            best = top_k_indices(scores, top_k)[0]
+            all_indices[qi, :len(best)] = candidates[best]
+            all_scores[qi, :len(best)] = scores[best]
+        return all_indices, all_scores
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, list_offsets=self.list_offsets, list_ids=self.list_ids,
+                 n_probe=self.n_probe)
+
+    @classmethod
+    def load(cls, path, n_probe=None):
+        data = np.load(path)
+        index = cls(n_lists=len(data['centroids']), n_probe=n_probe or int(data['n_probe']))
+        index.centroids = data['centroids']
+        index.list_offsets = data['list_offsets']
+        index.list_ids = data['list_ids']
+        return index
+
+    def __len__(self):
+        return 0 if self.list_ids is None else len(self.list_ids)
+
+
+if __name__ == "__main__":
+    # Builds an IVF index over the saved chunk index (run index.py first)
+    import argparse
+    import os
+    import time
+    from index import INDEX_DIR, ANN_FILE, load_index
+
+    parser = argparse.ArgumentParser(description="Build the IVF index for the saved chunk index")
+    parser.add_argument("--n-lists", type=int, default=None, help="clusters (default 4*sqrt(n_chunks))")
+    parser.add_argument("--n-probe", type=int, default=16, help="clusters scanned per query")
+    args = parser.parse_args()
+
+    store = load_index(INDEX_DIR)
+    if store is None:
+        raise SystemExit("No saved index found - run index.py first")
+    started = time.perf_counter()
+    ivf = IVFIndex(n_lists=args.n_lists, n_probe=args.n_probe).build(store.embeddings)
+    ivf.save(os.path.join(INDEX_DIR, ANN_FILE))
+    print(f"Built IVF index: {len(store)} chunks, {len(ivf.centroids)} lists, "
+          f"n_probe={ivf.n_probe} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,191 @@
+''' Batch question answering: runs a JSONL file of questions through the bot.
+
+Each stage runs once for the whole batch rather than once per question:
+    embed     - every question in one encode call
+    retrieve  - one search_by_embedding call (a single matrix multiply in dense mode)
+    answer    - LLM calls sent concurrently, at most --concurrency in flight
+                and started no faster than --rpm per minute
+
+Input lines are either a JSON string or an object with a "query" (or
+"question") field; any "id" is carried through. Output is JSONL in input
+order: one "answer" record per question, then a "summary" record with the
+per-stage timings.
+
+    python batch.py questions.jsonl -o answers.jsonl --concurrency 8 --rpm 50
+'''
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+from embed import encode_texts
+from search import search_by_embedding
+from store import ChunkStore
+from cache import search_key
+from Rag_bot import LLM_MODEL, MAX_TOKENS, async_client, get_answer_cache, build_prompt
+
+CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 50
+
+
+def read_questions(path):
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {'query': item}
+            query = item.get('query') or item.get('question')
+            if not query:
+                raise ValueError(f"{path}:{line_number}: no 'query' or 'question' field")
+            questions.append({'id': item.get('id', line_number), 'query': query})
+    return questions
+
+
+class RateLimiter:
+    ''' Spaces request starts at least 60/per_minute seconds apart '''
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def answer_all(questions, sources, concurrency=CONCURRENCY, per_minute=REQUESTS_PER_MINUTE,
+                     on_done=None):
+    ''' Sends one LLM call per question that has no answer yet. Fills in
+    'answer', 'llm_seconds' and (on failure) 'error' on each question dict. '''
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(per_minute)
+
+    async def answer_one(question, retrieved):
+        async with semaphore:
+            await limiter.wait()
+            started = time.perf_counter()
+            try:
+                response = await async_client.messages.create(
+                    model=LLM_MODEL,
+                    max_tokens=MAX_TOKENS,
+                    messages=[{"role": "user", "content": build_prompt(question['query'], retrieved)}]
+                )
+                question['answer'] = response.content[0].text
+            except Exception as e:  # one failed question shouldn't sink the batch
+                question['error'] = f"{type(e).__name__}: {e}"
+            question['llm_seconds'] = time.perf_counter() - started
+        if on_done:
+            on_done(question)
+
+    await asyncio.gather(*(answer_one(q, s) for q, s in zip(questions, sources) if 'answer' not in q))
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def run_batch(questions, chunks, top_k=5, index=None, mode="dense", concurrency=CONCURRENCY,
+              per_minute=REQUESTS_PER_MINUTE, use_cache=True):
+    ''' Answers every question; returns (questions with answers + sources, stage timings) '''
+    store = ChunkStore.from_chunks(chunks)
+    queries = [q['query'] for q in questions]
+    timings = {}
+
+    started = time.perf_counter()
+    # An empty batch skips embedding and search: an empty query matrix can't be scored
+    query_embeddings = encode_texts(queries) if queries else []
+    timings['embed_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sources = (search_by_embedding(query_embeddings, store, top_k=top_k, index=index, queries=queries, mode=mode)
+               if queries else [])
+    timings['retrieve_seconds'] = time.perf_counter() - started
+
+    n_cached = 0
+    settings = search_key(store, index, mode)
+    if use_cache:
+        answer_cache = get_answer_cache()
+        for question, query_embedding in zip(questions, query_embeddings):
+            cached = answer_cache.lookup(query_embedding, store.version, top_k, settings)
+            if cached is not None:
+                # the cached answer cites the sources it was generated from, not this retrieval's
+                question['answer'], question['sources'], _, _ = cached
+                question['cached'] = True
+                n_cached += 1
+
+    done = 0
+    def progress(question):
+        nonlocal done
+        done += 1
+        print(f"[batch] {done}/{len(questions) - n_cached} answered", end="\r")
+
+    started = time.perf_counter()
+    asyncio.run(answer_all(questions, sources, concurrency, per_minute, on_done=progress))
+    timings['answer_seconds'] = time.perf_counter() - started
+    if len(questions) > n_cached:
+        print()
+
+    for question, retrieved, query_embedding in zip(questions, sources, query_embeddings):
+        if 'sources' not in question:
+            question['sources'] = [{k: v for k, v in s.items() if k != 'embedding'} for s in retrieved]
+        if use_cache and 'llm_seconds' in question and 'error' not in question:
+            answer_cache.store(question['query'], query_embedding, store.version, top_k, settings,
+                               question['answer'], question['sources'], question['llm_seconds'])
+
+    llm_times = [q['llm_seconds'] for q in questions if 'llm_seconds' in q]
+    timings.update({
+        'questions': len(questions),
+        'cached': n_cached,
+        'failed': sum('error' in q for q in questions),
+        'total_seconds': timings['embed_seconds'] + timings['retrieve_seconds'] + timings['answer_seconds'],
+        'llm_p50_seconds': percentile(llm_times, 50),
+        'llm_p99_seconds': percentile(llm_times, 99),
+    })
+    timings['questions_per_second'] = len(questions) / max(timings['total_seconds'], 1e-9)
+    return questions, timings
+
+def write_results(path, questions, timings, settings):
+    with open(path, "w", encoding="utf-8") as f:
+        for question in questions:
+            f.write(json.dumps({'type': 'answer', **question}) + "\n")
+        f.write(json.dumps({'type': 'summary', **settings, **timings}) + "\n")
+
+
+if __name__ == "__main__":
+    from extract import directory
+    from index import build_index, load_ann
+    from search import MODES
+
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against the PDF index")
+    parser.add_argument("questions", help="JSONL file, one question per line")
+    parser.add_argument("-o", "--output", help="results file (default: <questions>.answers.jsonl)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--mode", choices=MODES, default="dense")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="LLM calls in flight at once")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="LLM calls started per minute")
+    parser.add_argument("--no-cache", action="store_true", help="skip the persistent answer cache")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    chunks = build_index(directory)
+    questions, timings = run_batch(questions, chunks, top_k=args.top_k, index=load_ann(), mode=args.mode,
+                                   concurrency=args.concurrency, per_minute=args.rpm,
+                                   use_cache=not args.no_cache)
+
+    output = args.output or os.path.splitext(args.questions)[0] + ".answers.jsonl"
+    write_results(output, questions, timings, {'model': LLM_MODEL, 'top_k': args.top_k, 'mode': args.mode,
+                                               'concurrency': args.concurrency, 'rpm': args.rpm})
+    print(f"{timings['questions']} questions ({timings['cached']} cached, {timings['failed']} failed) "
+          f"in {timings['total_seconds']:.2f}s: embed {timings['embed_seconds']:.2f}s, "
+          f"retrieve {timings['retrieve_seconds']:.2f}s, answer {timings['answer_seconds']:.2f}s "
+          f"(LLM p50 {timings['llm_p50_seconds']:.2f}s, p99 {timings['llm_p99_seconds']:.2f}s) → {output}")
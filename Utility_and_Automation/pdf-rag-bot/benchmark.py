@@ -0,0 +1,558 @@
+''' Benchmarks for the retrieval side of the RAG bot.
+
+    python benchmark.py ann                 # synthetic 200k x 384 corpus
+    python benchmark.py ann --n 1000000     # bigger synthetic corpus
+    python benchmark.py ann --real          # the saved index (run index.py first)
+    python benchmark.py quant               # float32 vs float16 vs int8 (+ rescoring)
+    python benchmark.py lexical             # dense vs bm25 / prefilter / hybrid on the saved index
+    python benchmark.py startup             # import times + first-query latency (lazy vs preloaded model)
+    python benchmark.py dedupe              # index size + retrieval quality with near-duplicate removal
+    python benchmark.py embed               # concurrent query encodes: per-session vs micro-batched
+    python benchmark.py suite               # end-to-end stage rates + per-backend quality on synthetic PDFs
+    python benchmark.py suite --pages 100 1000 5000 --output runs/today.json
+
+Recall@k is measured against exact brute-force search on the same queries.
+'''
+import argparse
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from ann import ExactIndex, IVFIndex
+from store import QuantizedMatrix, quantize
+
+
+def synthetic_embeddings(n, dim=384, n_topics=2000, noise=0.8, seed=0):
+    ''' Clustered unit vectors - real chunk embeddings cluster by topic, which
+    is what IVF relies on, so uniform random vectors would understate recall '''
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    embeddings = np.empty((n, dim), dtype=np.float32)
+    block = 100_000
+    for start in range(0, n, block):
+        size = min(block, n - start)
+        rows = topics[rng.integers(0, n_topics, size=size)]
+        rows += noise * rng.normal(size=(size, dim)).astype(np.float32)
+        embeddings[start:start + size] = rows
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+def sample_queries(embeddings, n_queries, noise=0.3, seed=1):
+    # Queries are perturbed copies of corpus vectors, like a question that
+    # paraphrases a passage
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.choice(len(embeddings), size=n_queries, replace=False)].copy()
+    queries += noise * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def recall_at_k(found, truth):
+    hits = [len(set(f[f >= 0]) & set(t)) / len(t) for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+def time_per_query(index, queries, embeddings, top_k, **kwargs):
+    # One query at a time, as the bot issues them
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        indices, _ = index.search(query[None, :], embeddings, top_k, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        found.append(indices[0])
+    return np.array(found), np.array(latencies) * 1000
+
+def bench_ann(embeddings, n_queries=200, top_k=5, n_lists=None, probes=(1, 2, 4, 8, 16, 32)):
+    queries = sample_queries(embeddings, n_queries)
+    truth, exact_ms = time_per_query(ExactIndex(), queries, embeddings, top_k)
+    print(f"Corpus: {len(embeddings)} x {embeddings.shape[1]}, {n_queries} queries, k={top_k}")
+    print(f"{'exact':>10}  recall@{top_k}=1.000  p50={np.percentile(exact_ms, 50):7.2f} ms  "
+          f"p99={np.percentile(exact_ms, 99):7.2f} ms")
+
+    started = time.perf_counter()
+    ivf = IVFIndex(n_lists=n_lists).build(embeddings)
+    print(f"IVF build: {len(ivf.centroids)} lists in {time.perf_counter() - started:.1f}s")
+
+    rows = []
+    for n_probe in probes:
+        found, ms = time_per_query(ivf, queries, embeddings, top_k, n_probe=n_probe)
+        recall = recall_at_k(found, truth)
+        speedup = np.median(exact_ms) / np.median(ms)
+        rows.append({'n_probe': n_probe, 'recall': recall, 'p50_ms': float(np.percentile(ms, 50)),
+                     'p99_ms': float(np.percentile(ms, 99)), 'speedup': float(speedup)})
+        print(f"{'n_probe=' + str(n_probe):>10}  recall@{top_k}={recall:.3f}  p50={np.percentile(ms, 50):7.2f} ms  "
+              f"p99={np.percentile(ms, 99):7.2f} ms  ({speedup:.1f}x)")
+    return rows
+
+def bench_quantization(embeddings, n_queries=200, top_k=5, rescore_factor=4):
+    from search import rescore
+    queries = sample_queries(embeddings, n_queries)
+    truth, exact_ms = time_per_query(ExactIndex(), queries, embeddings, top_k)
+    print(f"Corpus: {len(embeddings)} x {embeddings.shape[1]}, {n_queries} queries, k={top_k}")
+    print(f"{'float32':>8}  {embeddings.nbytes / 1e6:8.1f} MB  recall@{top_k}=1.000  "
+          f"p50={np.percentile(exact_ms, 50):7.2f} ms")
+    rows = [{'dtype': 'float32', 'mb': embeddings.nbytes / 1e6, 'recall': 1.0,
+             'p50_ms': float(np.percentile(exact_ms, 50))}]
+    for dtype in ("float16", "int8"):
+        matrix = QuantizedMatrix(*quantize(embeddings, dtype))
+        found, ms = [], []
+        for query in queries:
+            started = time.perf_counter()
+            candidates, _ = ExactIndex().search(query[None, :], matrix, top_k * rescore_factor)
+            indices, _ = rescore(query[None, :], embeddings, candidates, top_k)
+            ms.append((time.perf_counter() - started) * 1000)
+            found.append(indices[0])
+        recall = recall_at_k(np.array(found), truth)
+        rows.append({'dtype': dtype, 'mb': matrix.nbytes / 1e6, 'recall': recall,
+                     'p50_ms': float(np.percentile(ms, 50))})
+        print(f"{dtype:>8}  {matrix.nbytes / 1e6:8.1f} MB  recall@{top_k}={recall:.3f}  "
+              f"p50={np.percentile(ms, 50):7.2f} ms  ({embeddings.nbytes / matrix.nbytes:.1f}x smaller)")
+    return rows
+
+def labeled_text_queries(texts, n_queries=200, span_words=8, seed=2):
+    ''' Builds two labeled query sets from the chunk texts themselves:
+    "passage"    - an 8-word span copied from a chunk, like a paraphrased question
+    "identifier" - a token with digits and punctuation (part number, clause id)
+    The relevant chunks for a query are every chunk containing it verbatim. '''
+    from chunk import TOKEN_RE
+    rng = np.random.default_rng(seed)
+    lowered = [" ".join(t.split()).lower() for t in texts]  # whitespace-normalised for matching
+    passages, identifiers = [], []
+    for i in rng.permutation(len(texts)):
+        words = texts[i].split()
+        if len(passages) < n_queries and len(words) > span_words:
+            start = rng.integers(0, len(words) - span_words)
+            passages.append(" ".join(words[start:start + span_words]))
+        ids = [t for t in TOKEN_RE.findall(lowered[i]) if not t.isalnum() and any(ch.isdigit() for ch in t)]
+        if len(identifiers) < n_queries and ids:
+            identifiers.append(ids[rng.integers(0, len(ids))])
+        if len(passages) >= n_queries and len(identifiers) >= n_queries:
+            break
+    labeled = {}
+    for name, queries in (("passage", passages), ("identifier", identifiers)):
+        labeled[name] = [(q, {j for j, t in enumerate(lowered) if q.lower() in t}) for q in queries]
+        labeled[name] = [(q, relevant) for q, relevant in labeled[name] if relevant]
+    return labeled
+
+def bench_lexical(store, top_k=5, n_queries=200):
+    from search import MODES, search_batch
+    store.lexical  # build BM25 up front if the index predates it
+    row_of = {chunk_id: row for row, chunk_id in enumerate(store.chunk_ids)}
+    for name, labeled in labeled_text_queries(store.texts, n_queries).items():
+        queries = [q for q, _ in labeled]
+        print(f"{name} queries: {len(queries)}, k={top_k}")
+        for mode in MODES:
+            ms, hit, rr = [], 0, 0.0
+            for query, relevant in labeled:
+                started = time.perf_counter()
+                results = search_batch([query], store, top_k=top_k, mode=mode)[0]
+                ms.append((time.perf_counter() - started) * 1000)
+                rows = [row_of[r['chunk_id']] for r in results]
+                ranks = [rank for rank, row in enumerate(rows) if row in relevant]
+                hit += bool(ranks)
+                rr += 1 / (ranks[0] + 1) if ranks else 0
+            print(f"  {mode:>9}  hit@{top_k}={hit / len(labeled):.3f}  MRR={rr / len(labeled):.3f}  "
+                  f"p50={np.percentile(ms, 50):6.2f} ms  p99={np.percentile(ms, 99):6.2f} ms")
+
+def bench_dedupe(chunks, top_k=5, n_queries=200, thresholds=(0.7, 0.8, 0.9)):
+    ''' Index size and retrieval quality with near-duplicates removed at each
+    threshold. Uses the labeled passage queries over the full chunk set; a
+    deduplicated result also counts for every chunk it stands in for.
+    distinct@k is the number of different near-duplicate groups (at the
+    default threshold) in the top k. '''
+    from dedupe import THRESHOLD, NearDuplicateIndex
+    from embed import encode_texts
+    from search import search_by_embedding
+    from store import ChunkStore
+
+    full = ChunkStore.from_chunks(chunks)
+    row_of = {chunk_id: row for row, chunk_id in enumerate(full.chunk_ids)}
+    labeled = labeled_text_queries(full.texts, n_queries)["passage"]
+    query_embeddings = encode_texts([q for q, _ in labeled])
+
+    def groups(threshold):
+        deduper = NearDuplicateIndex(threshold)
+        started = time.perf_counter()
+        kept, duplicates = deduper.dedupe(chunks)
+        elapsed = time.perf_counter() - started
+        group_of = {row_of[c['chunk_id']]: row_of[c['chunk_id']] for c in kept}
+        group_of.update({row_of[d['chunk_id']]: row_of[d['duplicate_of']] for d in duplicates})
+        return kept, group_of, elapsed
+
+    _, default_groups, _ = groups(THRESHOLD)
+    bytes_per_chunk = full.embeddings.shape[1] * (4 + 1) + 4  # float32 + int8 codes + scale
+    print(f"{len(full)} chunks, {len(labeled)} passage queries, k={top_k}")
+    print(f"  {'threshold':>9}  {'chunks':>7}  {'removed':>7}  {'vectors':>9}  {'dedupe':>8}  "
+          f"hit@{top_k}    MRR  distinct@{top_k}")
+    for threshold in (None,) + tuple(thresholds):
+        if threshold is None:
+            kept, group_of, elapsed = chunks, {row: row for row in range(len(full))}, 0.0
+        else:
+            kept, group_of, elapsed = groups(threshold)
+        members = {}
+        for row, group in group_of.items():
+            members.setdefault(group, set()).add(row)
+        store = full if threshold is None else ChunkStore.from_chunks(kept)
+        results = search_by_embedding(query_embeddings, store, top_k=top_k)
+        hit = rr = distinct = 0.0
+        for (_, relevant), hits in zip(labeled, results):
+            rows = [row_of[r['chunk_id']] for r in hits]
+            ranks = [rank for rank, row in enumerate(rows) if members[row] & relevant]
+            hit += bool(ranks)
+            rr += 1 / (ranks[0] + 1) if ranks else 0
+            distinct += len({default_groups[row] for row in rows})
+        n = len(labeled)
+        print(f"  {'none' if threshold is None else threshold:>9}  {len(kept):>7}  "
+              f"{1 - len(kept) / len(full):>7.1%}  {len(kept) * bytes_per_chunk / 1e6:>7.1f}MB  "
+              f"{elapsed:>7.2f}s  {hit / n:.3f}  {rr / n:.3f}  {distinct / n:>10.2f}")
+
+def bench_embed(sessions=(1, 4, 16, 32), queries_per_session=20):
+    ''' Concurrent sessions each encoding one query at a time, either straight
+    on the model (what every session used to do) or through the shared
+    micro-batcher. Reports throughput, per-query latency and batch sizes. '''
+    import threading
+    from embed import encode_direct, preload_model
+    from embed_service import MicroBatcher
+    preload_model(background=False)
+    encode_direct(["warm up"])
+    words = "plan housing policy site transport density green belt retail employment".split()
+    rng = np.random.default_rng(3)
+
+    def run(n_sessions, encode):
+        latencies = []
+        def session():
+            for _ in range(queries_per_session):
+                query = " ".join(rng.choice(words, size=8))
+                started = time.perf_counter()
+                encode([query])
+                latencies.append(time.perf_counter() - started)
+        threads = [threading.Thread(target=session) for _ in range(n_sessions)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return len(latencies) / (time.perf_counter() - started), np.array(latencies) * 1000
+
+    print(f"{queries_per_session} queries per session, one text per encode call")
+    for n_sessions in sessions:
+        qps, ms = run(n_sessions, encode_direct)
+        print(f"  {n_sessions:>3} sessions  per-session  {qps:7.1f} q/s  "
+              f"p50 {np.percentile(ms, 50):7.1f} ms  p99 {np.percentile(ms, 99):7.1f} ms")
+        batcher = MicroBatcher()
+        qps, ms = run(n_sessions, batcher.encode)
+        m = batcher.metrics()
+        print(f"  {n_sessions:>3} sessions  batched      {qps:7.1f} q/s  "
+              f"p50 {np.percentile(ms, 50):7.1f} ms  p99 {np.percentile(ms, 99):7.1f} ms  "
+              f"mean batch {m['mean_batch_size']:.1f}, max queue depth {m['max_queue_depth']}")
+
+SUITE_BACKENDS = ("exact", "int8", "ivf", "bm25", "prefilter", "hybrid")
+WORDS = ("plan policy site housing density transport retail employment green belt flood risk "
+         "heritage design parking school health infrastructure viability affordable tenure "
+         "allocation boundary corridor station appraisal consultation evidence delivery").split()
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_text_pdf(path, pages, font_size=10, leading=12):
+    ''' Minimal PDF with one Helvetica text stream per page (a list of lines
+    per page), written by hand so no PDF-writing dependency is needed '''
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        body = "\n".join(f"({pdf_escape(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 {font_size} Tf {leading} TL 50 800 Td\n{body}\nET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+def synthetic_pdf_corpus(directory, n_pages, pages_per_doc=20, lines_per_page=50, seed=4):
+    ''' Writes n_pages of generated planning-style text across PDFs of
+    pages_per_doc pages. Words follow a Zipf-like distribution; each document
+    has its own topic words; lines carry clause ids and part numbers (for the
+    identifier queries) and every page a running header. Returns the paths. '''
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, len(WORDS) + 1)
+    weights /= weights.sum()
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for doc in range((n_pages + pages_per_doc - 1) // pages_per_doc):
+        topic = [f"{w}{doc}" for w in rng.choice(WORDS, size=5, replace=False)]
+        pages = []
+        for page in range(min(pages_per_doc, n_pages - doc * pages_per_doc)):
+            lines = [f"Synthetic Local Plan - Document {doc + 1} - Page {page + 1}"]
+            for line in range(lines_per_page - 1):
+                words = list(rng.choice(WORDS, size=12, p=weights)) + list(rng.choice(topic, size=2))
+                rng.shuffle(words)
+                if line % 5 == 0:
+                    words.insert(0, f"{doc + 1}.{page + 1}.{line + 1}")
+                if line % 9 == 0:
+                    words.append(f"{chr(65 + doc % 26)}-{rng.integers(1000, 10000)}")
+                lines.append(" ".join(words))
+            pages.append(lines)
+        path = os.path.join(directory, f"synthetic-{doc + 1:04d}.pdf")
+        write_text_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+def latency_stats(seconds):
+    ms = np.array(seconds) * 1000
+    return {'p50_ms': float(np.percentile(ms, 50)), 'p99_ms': float(np.percentile(ms, 99))}
+
+def bench_corpus(paths, top_k=5, n_queries=100, workers=None):
+    ''' Runs one corpus through every stage and every search backend.
+    Returns a JSON-serialisable dict of rates, latencies and quality. '''
+    from extract import extract_pdfs
+    from chunk import BM25Index, chunk_all_pages
+    from embed import embed_chunks, encode_texts
+    from search import search_by_embedding
+    from store import ChunkStore
+
+    result = {'pdfs': len(paths), 'bytes': sum(os.path.getsize(p) for p in paths), 'stages': {}}
+    stages = result['stages']
+
+    started = time.perf_counter()
+    pages, failed = extract_pdfs(paths, workers=workers)
+    elapsed = time.perf_counter() - started
+    stages['extract'] = {'pages': len(pages), 'seconds': elapsed, 'pages_per_s': len(pages) / elapsed,
+                         'mb_per_s': result['bytes'] / 1e6 / elapsed, 'failed': len(failed)}
+
+    started = time.perf_counter()
+    chunks = chunk_all_pages(pages)
+    elapsed = time.perf_counter() - started
+    stages['chunk'] = {'chunks': len(chunks), 'seconds': elapsed, 'chunks_per_s': len(chunks) / max(elapsed, 1e-9)}
+
+    started = time.perf_counter()
+    chunks = embed_chunks(chunks, cache_path=None, verbose=False)  # no cache: measure the model
+    elapsed = time.perf_counter() - started
+    stages['embed'] = {'seconds': elapsed, 'embeddings_per_s': len(chunks) / elapsed}
+
+    store = ChunkStore.from_chunks(chunks)
+    started = time.perf_counter()
+    store.bm25 = BM25Index().add(store.texts).finalize()
+    stages['bm25_build_seconds'] = time.perf_counter() - started
+    started = time.perf_counter()
+    ivf = IVFIndex().build(store.embeddings)
+    stages['ivf_build_seconds'] = time.perf_counter() - started
+    quantized_store = ChunkStore(store.embeddings, store.chunk_ids, store.filenames, store.page_numbers,
+                                 store.chunk_numbers, store.texts, quantized=QuantizedMatrix(
+                                     *quantize(store.embeddings, "int8")), bm25=store.bm25)
+
+    labeled = [item for queries in labeled_text_queries(store.texts, n_queries).values() for item in queries]
+    queries = [q for q, _ in labeled]
+    encode_seconds, query_embeddings = [], []
+    for query in queries:
+        started = time.perf_counter()
+        query_embeddings.append(encode_texts([query])[0])
+        encode_seconds.append(time.perf_counter() - started)
+    stages['query_embed'] = latency_stats(encode_seconds)
+    row_of = {chunk_id: row for row, chunk_id in enumerate(store.chunk_ids)}
+
+    backends = {
+        'exact': (store, None, "dense"),
+        'int8': (quantized_store, None, "dense"),
+        'ivf': (store, ivf, "dense"),
+        'bm25': (store, None, "bm25"),
+        'prefilter': (store, None, "prefilter"),
+        'hybrid': (store, None, "hybrid"),
+    }
+    result['queries'] = len(labeled)
+    result['backends'] = {}
+    for name, (backend_store, index, mode) in backends.items():
+        seconds, hit, recall = [], 0.0, 0.0
+        for (query, relevant), query_embedding in zip(labeled, query_embeddings):
+            started = time.perf_counter()
+            hits = search_by_embedding(query_embedding[None, :], backend_store, top_k=top_k, index=index,
+                                       queries=[query], mode=mode)[0]
+            seconds.append(time.perf_counter() - started)
+            found = {row_of[h['chunk_id']] for h in hits}
+            hit += bool(found & relevant)
+            recall += len(found & relevant) / min(top_k, len(relevant))
+        result['backends'][name] = {f'hit_at_{top_k}': hit / len(labeled),
+                                    f'recall_at_{top_k}': recall / len(labeled), **latency_stats(seconds)}
+    return result
+
+def bench_suite(page_counts=(50, 200, 800), corpus=None, top_k=5, n_queries=100, output=None, keep=False):
+    ''' Stage rates and per-backend quality for synthetic corpora of increasing
+    size (or one existing PDF directory), written to JSON for comparing runs.
+    Relevance labels are verbatim: a passage or identifier query is relevant
+    to every chunk that contains it (see labeled_text_queries). '''
+    import json
+    import platform
+    import shutil
+    import tempfile
+    from embed import MODEL_NAME, preload_model
+    from extract import list_pdfs_in_directory
+
+    preload_model(background=False)  # keep model load time out of the embed rate
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count(), 'numpy': np.__version__},
+        'model': MODEL_NAME,
+        'top_k': top_k,
+        'runs': [],
+    }
+    if corpus:
+        runs = [(corpus, [os.path.join(corpus, f) for f in sorted(list_pdfs_in_directory(corpus))])]
+    else:
+        workdir = tempfile.mkdtemp(prefix="rag-bench-")
+        runs = [(f"synthetic-{n}", synthetic_pdf_corpus(os.path.join(workdir, str(n)), n)) for n in page_counts]
+    try:
+        for name, paths in runs:
+            result = {'corpus': name, **bench_corpus(paths, top_k=top_k, n_queries=n_queries)}
+            report['runs'].append(result)
+            s = result['stages']
+            print(f"{name}: {s['extract']['pages']} pages, {s['chunk']['chunks']} chunks, {result['queries']} queries")
+            print(f"  extract {s['extract']['pages_per_s']:8.1f} pages/s   chunk {s['chunk']['chunks_per_s']:10.0f} chunks/s"
+                  f"   embed {s['embed']['embeddings_per_s']:7.1f} embeddings/s"
+                  f"   query embed p50 {s['query_embed']['p50_ms']:.1f} ms")
+            for backend, m in result['backends'].items():
+                print(f"  {backend:>9}  hit@{top_k}={m[f'hit_at_{top_k}']:.3f}  recall@{top_k}={m[f'recall_at_{top_k}']:.3f}"
+                      f"  p50={m['p50_ms']:7.2f} ms  p99={m['p99_ms']:7.2f} ms")
+    finally:
+        if not corpus and not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    output = output or f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return report
+
+STARTUP_MODULES = ("extract", "chunk", "index", "search", "Rag_bot")
+
+FIRST_QUERY_SCRIPT = """
+import time
+started = time.perf_counter()
+from embed import preload_model, get_model
+from index import load_index
+from search import search_chunks
+if {preload}:
+    preload_model()
+store = load_index()
+ready = time.perf_counter()
+search_chunks("What is the plan about?", store)
+first = time.perf_counter()
+search_chunks("Which sites are allocated for housing?", store)
+second = time.perf_counter()
+print(ready - started, first - ready, second - first)
+"""
+
+def run_python(code):
+    # Fresh interpreter each time, so nothing is already imported or loaded
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True)
+    if out.returncode != 0:
+        return None, out.stderr.strip().splitlines()[-1]
+    return [float(x) for x in out.stdout.split()[-3:]], None
+
+def bench_startup():
+    print("Import time (fresh interpreter):")
+    for module in STARTUP_MODULES:
+        times, error = run_python(f"import time; t = time.perf_counter(); import {module}; "
+                                  f"print(time.perf_counter() - t)")
+        print(f"  {module:>8}  " + (f"{times[-1] * 1000:8.1f} ms" if times else f"failed: {error}"))
+    print("First query after start-up (index load + model load + search):")
+    for preload in (False, True):
+        times, error = run_python(FIRST_QUERY_SCRIPT.format(preload=preload))
+        label = "preloaded" if preload else "lazy"
+        if times is None:
+            print(f"  {label:>9}  failed: {error}")
+            continue
+        ready, first, second = times
+        print(f"  {label:>9}  ready {ready * 1000:8.1f} ms  first query {first * 1000:8.1f} ms  "
+              f"next query {second * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG retrieval benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    ann_parser = sub.add_parser("ann", help="IVF recall@k and latency vs exact search")
+    ann_parser.add_argument("--n", type=int, default=200_000, help="synthetic corpus size")
+    ann_parser.add_argument("--real", action="store_true", help="use the saved index instead")
+    ann_parser.add_argument("--queries", type=int, default=200)
+    ann_parser.add_argument("--top-k", type=int, default=5)
+    ann_parser.add_argument("--n-lists", type=int, default=None)
+    quant_parser = sub.add_parser("quant", help="memory and recall@k of quantized embeddings")
+    quant_parser.add_argument("--n", type=int, default=200_000, help="synthetic corpus size")
+    quant_parser.add_argument("--real", action="store_true", help="use the saved index instead")
+    quant_parser.add_argument("--queries", type=int, default=200)
+    quant_parser.add_argument("--top-k", type=int, default=5)
+    lexical_parser = sub.add_parser("lexical", help="dense vs BM25 / prefilter / hybrid retrieval quality")
+    lexical_parser.add_argument("--queries", type=int, default=200)
+    lexical_parser.add_argument("--top-k", type=int, default=5)
+    sub.add_parser("startup", help="import time and first-query latency")
+    suite_parser = sub.add_parser("suite", help="stage rates + per-backend recall on synthetic PDF corpora")
+    suite_parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800],
+                              help="synthetic corpus sizes in pages")
+    suite_parser.add_argument("--corpus", default=None, help="benchmark this PDF directory instead")
+    suite_parser.add_argument("--queries", type=int, default=100, help="queries per type (passage, identifier)")
+    suite_parser.add_argument("--top-k", type=int, default=5)
+    suite_parser.add_argument("--output", default=None, help="JSON results file")
+    suite_parser.add_argument("--keep", action="store_true", help="keep the generated PDFs")
+    embed_parser = sub.add_parser("embed", help="concurrent query encodes: per-session vs micro-batched")
+    embed_parser.add_argument("--queries", type=int, default=20, help="queries per session")
+    dedupe_parser = sub.add_parser("dedupe", help="index size and retrieval quality with near-duplicate removal")
+    dedupe_parser.add_argument("--dir", default=None, help="PDF directory (default: extract.directory)")
+    dedupe_parser.add_argument("--queries", type=int, default=200)
+    dedupe_parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.bench == "startup":
+        bench_startup()
+        raise SystemExit
+
+    if args.bench == "suite":
+        bench_suite(args.pages, corpus=args.corpus, top_k=args.top_k, n_queries=args.queries,
+                    output=args.output, keep=args.keep)
+        raise SystemExit
+
+    if args.bench == "embed":
+        bench_embed(queries_per_session=args.queries)
+        raise SystemExit
+
+    if args.bench == "dedupe":
+        # Needs every chunk, duplicates included, so it chunks the PDFs afresh
+        # (the embedding cache makes repeat runs cheap)
+        from extract import directory, extract_all_pdfs
+        from chunk import chunk_all_pages
+        from embed import embed_chunks
+        chunks = embed_chunks(chunk_all_pages(extract_all_pdfs(args.dir or directory)))
+        bench_dedupe(chunks, top_k=args.top_k, n_queries=args.queries)
+        raise SystemExit
+
+    if args.bench == "lexical":
+        from index import load_index
+        store = load_index()
+        if store is None:
+            raise SystemExit("No saved index found - run index.py first")
+        bench_lexical(store, top_k=args.top_k, n_queries=args.queries)
+        raise SystemExit
+
+    if args.real:
+        from index import load_index
+        store = load_index()
+        if store is None:
+            raise SystemExit("No saved index found - run index.py first")
+        embeddings = np.asarray(store.embeddings)
+    else:
+        embeddings = synthetic_embeddings(args.n)
+    n_queries = min(args.queries, len(embeddings))
+
+    if args.bench == "ann":
+        bench_ann(embeddings, n_queries=n_queries, top_k=args.top_k, n_lists=args.n_lists)
+    elif args.bench == "quant":
+        bench_quantization(embeddings, n_queries=n_queries, top_k=args.top_k)
@@ -0,0 +1,199 @@
+''' Caches in front of retrieval and the LLM call.
+
+QueryCache  - in-process LRUs for query embeddings and retrieval results
+AnswerCache - persistent (SQLite) answers, served when a new question's
+              embedding is within NEAR_HIT_THRESHOLD cosine similarity of a
+              cached one asked against the same corpus version, top_k and
+              search settings (see search_key)
+
+Both keep hit/miss counters, and the answer cache tracks how much latency the
+hits saved (the original retrieval + LLM time of the answer each hit reused).
+'''
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from embed import encode_texts
+from search import search_by_embedding
+
+ANSWER_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_cache.db")
+NEAR_HIT_THRESHOLD = 0.95
+EMBEDDING_CACHE_SIZE = 4096
+RETRIEVAL_CACHE_SIZE = 1024
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()  # Streamlit sessions share one instance across threads
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+def search_key(store, index=None, mode="dense"):
+    ''' The settings a result was produced under: retrieval mode, ANN index
+    (and its n_probe) and the quantized matrix scored first. Each changes which
+    chunks come back, so cached results are only reused under the same key. '''
+    ann = "exact" if index is None else f"{type(index).__name__}/{getattr(index, 'n_probe', None)}"
+    quantized = getattr(store, 'quantized', None)
+    quantization = "float32" if quantized is None else str(quantized.codes.dtype)
+    return f"{mode}|{ann}|{quantization}"
+
+
+class QueryCache:
+    def __init__(self, embedding_size=EMBEDDING_CACHE_SIZE, retrieval_size=RETRIEVAL_CACHE_SIZE):
+        self.embeddings = LRUCache(embedding_size)
+        self.retrievals = LRUCache(retrieval_size)
+
+    def embed(self, query):
+        vector = self.embeddings.get(query)
+        if vector is None:
+            vector = encode_texts([query])[0]
+            self.embeddings.put(query, vector)
+        return vector
+
+    def retrieve(self, query, store, top_k, index=None, mode="dense"):
+        key = (query, store.version, top_k, search_key(store, index, mode))
+        results = self.retrievals.get(key)
+        if results is None:
+            query_embedding = self.embed(query)
+            results = search_by_embedding(query_embedding[None, :], store, top_k=top_k, index=index,
+                                          queries=[query], mode=mode)[0]
+            self.retrievals.put(key, results)
+        return results
+
+
+class AnswerCache:
+    def __init__(self, path=ANSWER_CACHE_PATH, threshold=NEAR_HIT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        # (version, top_k, search key) → (row ids, embedding matrix), loaded on first use.
+        # The mode column holds the full search_key(), not just the mode name
+        self._matrices = {}
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY,
+                    corpus_version TEXT NOT NULL,
+                    top_k INTEGER NOT NULL,
+                    mode TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    answer TEXT NOT NULL,
+                    sources TEXT NOT NULL,
+                    latency_seconds REAL NOT NULL,
+                    created TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_key ON answers (corpus_version, top_k, mode)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _matrix(self, key):
+        if key not in self._matrices:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, embedding FROM answers WHERE corpus_version = ? AND top_k = ? AND mode = ?", key
+                ).fetchall()
+            ids = np.array([r[0] for r in rows], dtype=np.int64)
+            matrix = (np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+                      if rows else np.zeros((0, 0), dtype=np.float32))
+            self._matrices[key] = (ids, matrix)
+        return self._matrices[key]
+
+    def lookup(self, query_embedding, version, top_k, mode):
+        ''' Returns (answer, sources, matched query, similarity) or None '''
+        key = (version, top_k, mode)
+        with self._lock:
+            ids, matrix = self._matrix(key)
+            if len(ids) == 0:
+                self.misses += 1
+                return None
+            similarities = matrix @ np.asarray(query_embedding, dtype=np.float32)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            with self._connect() as conn:
+                answer, sources, query, latency = conn.execute(
+                    "SELECT answer, sources, query, latency_seconds FROM answers WHERE id = ?", (int(ids[best]),)
+                ).fetchone()
+                conn.execute("UPDATE answers SET hits = hits + 1 WHERE id = ?", (int(ids[best]),))
+            self.hits += 1
+            self.saved_seconds += latency
+        return answer, json.loads(sources), query, float(similarities[best])
+
+    def store(self, query, query_embedding, version, top_k, mode, answer, sources, latency_seconds):
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        sources = [{k: v for k, v in s.items() if k != 'embedding'} for s in sources]
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO answers (corpus_version, top_k, mode, query, embedding, answer, sources,"
+                " latency_seconds, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (version, top_k, mode, query, vector.tobytes(), answer, json.dumps(sources),
+                 latency_seconds, time.strftime("%Y-%m-%dT%H:%M:%S")),
+            )
+            key = (version, top_k, mode)
+            if key in self._matrices:
+                ids, matrix = self._matrices[key]
+                matrix = np.vstack([matrix, vector[None, :]]) if len(ids) else vector[None, :]
+                self._matrices[key] = (np.append(ids, cursor.lastrowid), matrix)
+
+    def totals(self):
+        ''' Lifetime numbers from the database (this process's counters are on the instance) '''
+        with self._connect() as conn:
+            n_answers, n_hits, saved = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * latency_seconds), 0) FROM answers"
+            ).fetchone()
+        return {'answers': n_answers, 'hits': n_hits, 'saved_seconds': saved}
+
+
+def hit_rate(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+def cache_stats(query_cache, answer_cache):
+    return {
+        'embedding_hit_rate': hit_rate(query_cache.embeddings.hits, query_cache.embeddings.misses),
+        'retrieval_hit_rate': hit_rate(query_cache.retrievals.hits, query_cache.retrievals.misses),
+        'answer_hits': answer_cache.hits,
+        'answer_hit_rate': hit_rate(answer_cache.hits, answer_cache.misses),
+        'answer_seconds_saved': answer_cache.saved_seconds,
+    }
+
+if __name__ == "__main__":
+    totals = AnswerCache().totals()
+    print(f"Answer cache: {totals['answers']} answers, {totals['hits']} hits, "
+          f"{totals['saved_seconds']:.1f}s of retrieval + LLM time saved")
@@ -1,6 +1,8 @@
 ''' Chunking logic for splitting extracted text into manageable pieces '''
 import os
-from typing import List, Dict
+import re
+from typing import List, Dict, Iterator
+import numpy as np
 
 
 def chunk_txt(text, chunk_size=700, overlap=100) -> List[str]:
@@ -17,19 +19,141 @@ def chunk_txt(text, chunk_size=700, overlap=100) -> List[str]:
     return chunks
 
 def chunk_all_pages(pages) -> List[Dict]:
-    all_chunks = []
+    return list(iter_chunks(pages))
+
+def iter_chunks(pages) -> Iterator[Dict]:
+    ''' Generator version of chunk_all_pages, for streaming pages through '''
     for page in pages:
         text = page['text']
         chunks = chunk_txt(text)
         for i, chunk in enumerate(chunks):
-            all_chunks.append({
+            yield {
                 'chunk_id': f"{page['filename']}_p{page['page_number']}_c{i+1}",
                 'filename': page['filename'],
                 'page_number': page['page_number'],
                 'chunk_number': i + 1,
                 'text': chunk
-            })
-    return all_chunks
+            }
+
+# Keeps identifiers such as part numbers ("A-1234.5") and clause ids ("4.2.1")
+# together as one token; each compound token is also indexed by its parts.
+# \w is Unicode-aware, so "Straße" or "größe" stay whole words
+TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+# Bumped whenever tokenize() changes; a saved BM25 index built with another
+# version is rebuilt instead of loaded
+TOKENIZER_VERSION = 2
+
+def tokenize(text) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    ''' Okapi BM25 over the chunks, stored as an inverted index (CSR layout):
+    the postings of term t are docs[offsets[t]:offsets[t + 1]] with term
+    frequencies tfs[offsets[t]:offsets[t + 1]]. Documents are chunk rows, in
+    the same order as the chunk store.
+
+    Documents are added with add() while the index is being built and
+    frozen into arrays by finalize(); a loaded index is already frozen. '''
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}   # term → [(doc, tf), ...] while building
+        self._doc_lens = []
+        self.vocab = None     # term → term id once finalized
+        self.tokenizer = TOKENIZER_VERSION
+
+    def add(self, texts):
+        for text in texts:
+            doc = len(self._doc_lens)
+            counts = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self._postings.setdefault(token, []).append((doc, tf))
+            self._doc_lens.append(len(tokens))
+        return self
+
+    def finalize(self):
+        terms = sorted(self._postings)
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        lengths = [len(self._postings[t]) for t in terms]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.docs = np.fromiter((d for t in terms for d, _ in self._postings[t]), dtype=np.int32,
+                                count=int(self.offsets[-1]))
+        self.tfs = np.fromiter((tf for t in terms for _, tf in self._postings[t]), dtype=np.float32,
+                               count=int(self.offsets[-1]))
+        self.doc_lens = np.asarray(self._doc_lens, dtype=np.float32)
+        self._postings, self._doc_lens = {}, []
+        self._prepare()
+        return self
+
+    def _prepare(self):
+        n_docs = len(self.doc_lens)
+        df = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(self.doc_lens.mean()) if n_docs else 0.0
+        self._norm = self.k1 * (1 - self.b + self.b * self.doc_lens / max(avgdl, 1e-9))
+
+    def __len__(self):
+        return len(self.doc_lens) if self.vocab is not None else len(self._doc_lens)
+
+    def scores(self, query):
+        ''' BM25 score of every document; only the postings of the query terms are touched '''
+        scores = np.zeros(len(self), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs, tfs = self.docs[start:end], self.tfs[start:end]
+            scores[docs] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+        return scores
+
+    def search(self, query, top_k=5):
+        ''' (indices, scores) of the top_k matching documents, best first;
+        fewer when fewer documents contain a query term '''
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(scores[matched], len(matched) - top_k)[-top_k:]]
+        order = matched[np.lexsort((matched, -scores[matched]))]
+        return order, scores[order]
+
+    def save(self, path):
+        # Terms are stored as one newline-joined UTF-8 buffer: a fixed-width
+        # string array would pad every term to the longest one
+        terms = "\n".join(sorted(self.vocab, key=self.vocab.get)).encode("utf-8")
+        np.savez(path, terms_utf8=np.frombuffer(terms, dtype=np.uint8),
+                 offsets=self.offsets, docs=self.docs, tfs=self.tfs, doc_lens=self.doc_lens,
+                 params=np.array([self.k1, self.b], dtype=np.float32),
+                 tokenizer=np.array(self.tokenizer))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        k1, b = data['params']
+        index = cls(k1=float(k1), b=float(b))
+        if 'terms_utf8' in data:
+            terms = data['terms_utf8'].tobytes().decode("utf-8").split("\n") if len(data['offsets']) > 1 else []
+        else:
+            terms = data['terms'].tolist()  # indexes saved before terms_utf8
+        index.vocab = {term: i for i, term in enumerate(terms)}
+        index.tokenizer = int(data['tokenizer']) if 'tokenizer' in data else 1
+        index.offsets = data['offsets']
+        index.docs = data['docs']
+        index.tfs = data['tfs']
+        index.doc_lens = data['doc_lens']
+        index._prepare()
+        return index
 
 if __name__ == "__main__":
     from extract import extract_all_pdfs, directory
@@ -37,4 +161,9 @@ if __name__ == "__main__":
     chunks = chunk_all_pages(pages)
     print(f"Total chunks: {len(chunks)}")
     print(chunks[0])
-    print(chunks[1]['text'][:100])  
\ No newline at end of file
+    print(chunks[1]['text'][:100])
+
+    bm25 = BM25Index().add(c['text'] for c in chunks).finalize()
+    indices, scores = bm25.search("local plan", top_k=3)
+    print(f"BM25 vocabulary: {len(bm25.vocab)} terms; top 'local plan' chunks: "
+          f"{[chunks[i]['chunk_id'] for i in indices]}")
\ No newline at end of file
@@ -0,0 +1,135 @@
+''' Near-duplicate chunk detection with MinHash signatures and LSH banding.
+
+Repeated headers, footers and boilerplate pages produce chunks that are the
+same text give or take a page number or a shifted window. Each chunk is
+reduced to a set of word 3-shingles, and the set to a NUM_PERM-value MinHash
+signature. The fraction of matching signature values estimates the Jaccard
+similarity of the two shingle sets.
+
+LSH splits the signature into BANDS bands of NUM_PERM / BANDS rows. Two chunks
+become candidates when every value in at least one band matches, which is
+likely above roughly (1/BANDS)^(BANDS/NUM_PERM) similarity (0.71 for 16 x 8)
+and unlikely below. Only candidates are compared, so finding duplicates stays
+close to linear in the number of chunks. A candidate whose estimated
+similarity is at least `threshold` counts as a duplicate.
+
+The first chunk seen in a group is kept as its representative. Every later
+member is dropped before embedding and recorded with `duplicate_of`, so
+retrieval results can still link to every place the text appears.
+
+Words are Unicode (chunk.TOKEN_RE), so Cyrillic, Greek or CJK text is
+shingled like English. A chunk with no words at all (symbols, rules, an
+empty table) has no shingles to compare and is always kept.
+'''
+import hashlib
+import zlib
+import numpy as np
+from chunk import TOKEN_RE
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_WORDS = 3
+THRESHOLD = 0.8
+_PRIME = 4294967291  # largest prime below 2**32, so hash values fit in uint32
+
+
+def shingles(text, k=SHINGLE_WORDS):
+    words = TOKEN_RE.findall(text.lower())
+    if not words:
+        return set()
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    ''' NUM_PERM universal hash functions h(x) = (a·x + b) mod p over crc32
+    shingle hashes. a, b < 2**31 keep a·x + b inside uint64. '''
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        grams = shingles(text)
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+        return ((hashes[:, None] * self.a + self.b) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    ''' Streaming deduplicator: feed it chunks batch by batch with dedupe(). '''
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, seed)
+        self.rows = num_perm // bands
+        self.buckets = [{} for _ in range(bands)]  # band values → representative ids
+        self.exact = {}  # normalised text hash → representative id; skips MinHash for exact repeats
+        self.signatures = {}
+        self.files = {}  # representative id → filename
+        self.n_seen = 0
+        self.n_duplicates = 0
+
+    def _bands(self, signature):
+        for band, start in enumerate(range(0, len(signature), self.rows)):
+            yield self.buckets[band], signature[start:start + self.rows].tobytes()
+
+    def find(self, signature):
+        ''' Id of the most similar representative at or above the threshold, or None '''
+        candidates = set()
+        for buckets, key in self._bands(signature):
+            candidates.update(buckets.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = np.count_nonzero(self.signatures[candidate] == signature) / len(signature)
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def add(self, chunk, signature=None):
+        ''' Registers a chunk as a representative '''
+        key = chunk['chunk_id']
+        signature = self.hasher.signature(chunk['text']) if signature is None else signature
+        self.signatures[key] = signature
+        self.files[key] = chunk['filename']
+        for buckets, band_key in self._bands(signature):
+            buckets.setdefault(band_key, []).append(key)
+        self.exact.setdefault(_text_key(chunk['text']), key)
+
+    def dedupe(self, chunks):
+        ''' Splits chunks into (kept, duplicates). Kept chunks become
+        representatives; each duplicate is a copy with 'duplicate_of' (and
+        'duplicate_of_file') pointing at its representative. '''
+        kept, duplicates = [], []
+        for chunk in chunks:
+            self.n_seen += 1
+            if TOKEN_RE.search(chunk['text']) is None:
+                # no words, no shingles: nothing to judge similarity on, so never a duplicate
+                kept.append(chunk)
+                continue
+            representative = self.exact.get(_text_key(chunk['text']))
+            signature = None
+            if representative is None:
+                signature = self.hasher.signature(chunk['text'])
+                representative = self.find(signature)
+            if representative is None:
+                self.add(chunk, signature)
+                kept.append(chunk)
+            else:
+                self.n_duplicates += 1
+                duplicates.append(dict(chunk, duplicate_of=representative,
+                                       duplicate_of_file=self.files[representative]))
+        return kept, duplicates
+
+    def summary(self):
+        share = self.n_duplicates / self.n_seen if self.n_seen else 0.0
+        return (f"[dedupe] {self.n_duplicates} of {self.n_seen} chunks were near-duplicates "
+                f"({share:.1%}), {self.n_seen - self.n_duplicates} kept")
+
+
+def _text_key(text):
+    return hashlib.sha1(" ".join(text.split()).lower().encode("utf-8")).digest()
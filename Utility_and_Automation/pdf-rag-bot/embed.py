@@ -1,18 +1,128 @@
 # Embedding the chunks using a pre-trained model
-from sentence_transformers import SentenceTransformer
-model = SentenceTransformer('all-MiniLM-L6-v2')
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
 
-def embed_chunks(chunks):
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# The model (and torch behind it) is only loaded on first use, so scripts that
+# just extract or chunk never pay for it. One instance is shared process-wide.
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:  # another thread may have loaded it while we waited
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+def preload_model(background=True):
+    ''' Starts loading the model now, e.g. while the UI loads the index.
+    Returns the loader thread (already finished when background=False). '''
+    thread = threading.Thread(target=get_model, name="model-preload", daemon=True)
+    thread.start()
+    if not background:
+        thread.join()
+    return thread
+
+def model_loaded():
+    return _model is not None
+
+def encode_texts(texts):
+    # Routed through embed_service: the shared in-process micro-batcher, or the
+    # HTTP service when EMBED_SERVICE_URL is set
+    from embed_service import encode
+    return encode(list(texts))
+
+def encode_direct(texts):
+    ''' Encodes on this process's model, bypassing the embedding service '''
+    return get_model().encode(list(texts), convert_to_tensor=False, normalize_embeddings=True)
+
+def __getattr__(name):
+    # Keeps `from embed import model` working, loading the model at that point
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Embeddings already computed are kept on disk, keyed by a hash of the model
+# name + chunk text, so a restart only encodes chunks it has never seen.
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.db")
+LOOKUP_BATCH = 500  # keys per SELECT ... IN (...) query (SQLite variable limit)
+
+
+def chunk_key(text, model_name=MODEL_NAME):
+    return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+def open_cache(path=CACHE_PATH):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS embeddings (
+            key TEXT PRIMARY KEY,
+            vector BLOB NOT NULL
+        )
+    """)
+    conn.commit()
+    return conn
+
+def lookup_cached(conn, keys):
+    found = {}
+    unique_keys = list(dict.fromkeys(keys))
+    for start in range(0, len(unique_keys), LOOKUP_BATCH):
+        batch = unique_keys[start:start + LOOKUP_BATCH]
+        placeholders = ", ".join("?" for _ in batch)
+        rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+        for key, blob in rows:
+            found[key] = np.frombuffer(blob, dtype=np.float32)
+    return found
+
+def store_embeddings(conn, keys, embeddings):
+    conn.executemany(
+        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+        [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in zip(keys, embeddings)],
+    )
+    conn.commit()
+
+def embed_chunks(chunks, cache_path=CACHE_PATH, verbose=True):
     texts = [chunk['text'] for chunk in chunks]
-    embeddings = model.encode(texts, convert_to_tensor=False, normalize_embeddings=True)
-    for i, chunk in enumerate(chunks):
-        chunk['embedding'] = embeddings[i]
+    if cache_path is None:
+        embeddings = encode_texts(texts)
+        for i, chunk in enumerate(chunks):
+            chunk['embedding'] = embeddings[i]
+        return chunks
+
+    keys = [chunk_key(text) for text in texts]
+    conn = open_cache(cache_path)
+    try:
+        vectors = lookup_cached(conn, keys)
+        # Only encode texts with no stored vector (each distinct text once)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            new_embeddings = encode_texts(missing.values())
+            store_embeddings(conn, missing.keys(), new_embeddings)
+            for key, vec in zip(missing.keys(), new_embeddings):
+                vectors[key] = np.asarray(vec, dtype=np.float32)
+    finally:
+        conn.close()
+
+    if verbose:
+        print(f"Embeddings: {len(texts) - len(missing)} reused from cache, {len(missing)} newly encoded")
+    for key, chunk in zip(keys, chunks):
+        chunk['embedding'] = vectors[key]
     return chunks
 
 if __name__ == "__main__":
     # Quick sanity check with known similar/dissimilar sentences
     test_chunks = [{"text": "The cat sat on the mat."}, {"text": "A feline rested on the rug."}, {"text": "Quarterly revenue increased by 12%."}]
-    result = embed_chunks(test_chunks)
+    result = embed_chunks(test_chunks, cache_path=None)
     sim_similar = np.dot(result[0]['embedding'], result[1]['embedding'])
     sim_different = np.dot(result[0]['embedding'], result[2]['embedding'])
     print(f"Sanity check — similar: {sim_similar:.3f}, different: {sim_different:.3f}")
@@ -24,4 +134,4 @@ if __name__ == "__main__":
     pages = extract_all_pdfs(directory)
     chunks = chunk_all_pages(pages)
     chunks = embed_chunks(chunks)
-    print(f"Embedded {len(chunks)} chunks")
\ No newline at end of file
+    print(f"Embedded {len(chunks)} chunks")
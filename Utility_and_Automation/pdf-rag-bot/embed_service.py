@@ -0,0 +1,251 @@
+''' Shared embedding service with micro-batching.
+
+Encoding one query costs almost as much as encoding a small batch: on CPU,
+MiniLM takes about 25 ms for 1 text and about 40 ms for 8. MicroBatcher
+holds the one model instance and puts requests in a queue. A single worker
+thread takes whatever is queued and waits up to MAX_WAIT_MS for more, up to
+MAX_BATCH texts. It then encodes them in one call and hands each caller its
+rows. Concurrent Streamlit sessions therefore share forward passes instead
+of queueing behind each other's batch-of-one encodes.
+
+In-process, embed.encode_texts goes through the shared batcher. For several
+processes (UI workers, batch jobs), run the HTTP service once and point them
+at it with EMBED_SERVICE_URL:
+
+    python embed_service.py --port 8770
+    EMBED_SERVICE_URL=http://127.0.0.1:8770 streamlit run UI.py
+
+    POST /embed    {"texts": [...]}  →  {"embeddings": [[...], ...]}
+    GET  /metrics  queue depth, batch sizes, wait and encode times
+'''
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+MAX_BATCH = 64      # texts per forward pass
+MAX_WAIT_MS = 3     # how long the first request of a batch waits for company
+DEFAULT_PORT = 8770
+SERVICE_URL = os.environ.get("EMBED_SERVICE_URL")
+
+
+class MicroBatcher:
+    ''' Collects encode requests from many threads into shared batches.
+    encode_fn(list of texts) → array of normalized embeddings, one row per text. '''
+
+    def __init__(self, encode_fn=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        if encode_fn is None:
+            from embed import encode_direct as encode_fn
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.max_batch_size = 0
+        self.batch_sizes = {}  # texts per batch → number of batches
+        self.wait_seconds = 0.0
+        self.encode_seconds = 0.0
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts):
+        ''' Returns a Future resolving to the embeddings of texts '''
+        future = Future()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        with self._lock:
+            self.requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def encode(self, texts):
+        return self.submit(texts).result()
+
+    def _collect(self):
+        # Blocks for the first request, then gathers more until the batch is
+        # full or the first request has waited max_wait
+        items = [self._queue.get()]
+        n_texts = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_texts < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            items.append(item)
+            n_texts += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            texts = [text for item in items for text in item[0]]
+            started = time.perf_counter()
+            try:
+                embeddings = (np.asarray(self.encode_fn(texts), dtype=np.float32) if texts
+                              else np.zeros((0, 0), dtype=np.float32))
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            start = 0
+            for item_texts, future, _ in items:
+                future.set_result(embeddings[start:start + len(item_texts)])
+                start += len(item_texts)
+            with self._lock:
+                self.batches += 1
+                self.texts += len(texts)
+                self.max_batch_size = max(self.max_batch_size, len(texts))
+                self.batch_sizes[len(texts)] = self.batch_sizes.get(len(texts), 0) + 1
+                self.wait_seconds += sum(started - queued for _, _, queued in items)
+                self.encode_seconds += finished - started
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'requests': self.requests,
+                'texts': self.texts,
+                'batches': self.batches,
+                'mean_batch_size': self.texts / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'batch_sizes': dict(sorted(self.batch_sizes.items())),
+                'mean_wait_ms': 1000 * self.wait_seconds / self.requests if self.requests else 0.0,
+                'encode_seconds': self.encode_seconds,
+            }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher():
+    ''' The process-wide batcher (started on first use) '''
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher()
+    return _batcher
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = EmbeddingClient(SERVICE_URL)
+    return _client
+
+def encode(texts):
+    ''' What embed.encode_texts calls. Requests that already fill a batch
+    (e.g. index builds) skip the queue and go straight to the model. '''
+    if SERVICE_URL:
+        return get_client().encode(texts)
+    if len(texts) >= MAX_BATCH:
+        from embed import encode_direct
+        return encode_direct(texts)
+    return get_batcher().encode(texts)
+
+def service_metrics():
+    ''' Metrics of whichever service this process uses (None before first use) '''
+    if SERVICE_URL:
+        return get_client().metrics()
+    return None if _batcher is None else _batcher.metrics()
+
+
+class EmbeddingClient:
+    ''' Talks to a running embed_service over HTTP '''
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def encode(self, texts):
+        embeddings = self._call("/embed", {"texts": list(texts)})["embeddings"]
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def metrics(self):
+        return self._call("/metrics")
+
+
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(self.batcher.metrics())
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != "/embed":
+            self.send_error(404)
+            return
+        try:
+            texts = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))["texts"]
+        except (ValueError, KeyError, TypeError):
+            self._send_json({"error": "expected {\"texts\": [...]}"}, status=400)
+            return
+        # Each connection has its own handler thread, so concurrent clients
+        # land in the batcher's queue together and share a batch
+        try:
+            embeddings = self.batcher.encode(texts)
+        except Exception as e:
+            self._send_json({"error": f"{type(e).__name__}: {e}"}, status=500)
+            return
+        self._send_json({"embeddings": np.round(embeddings, 6).tolist()})
+
+
+def serve(port=DEFAULT_PORT, batcher=None, background=False):
+    handler = type("ConfiguredEmbeddingHandler", (EmbeddingHandler,), {"batcher": batcher or get_batcher()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, name="embed-service", daemon=True).start()
+        return server
+    print(f"Embedding service on http://127.0.0.1:{server.server_address[1]} "
+          f"(batches of up to {handler.batcher.max_batch}, {handler.batcher.max_wait * 1000:.0f} ms wait)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared micro-batching embedding service")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+    from embed import preload_model
+    preload_model(background=False)  # load before accepting requests
+    serve(args.port, MicroBatcher(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms))
@@ -1,8 +1,17 @@
 import pypdf
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 
-directory = "/Users/chizobawisdom/Portfolio/Utility_and_Automation/pdf-rag-bot/data" 
+directory = "/Users/chizobawisdom/Portfolio/Utility_and_Automation/pdf-rag-bot/data"
+
+# PDFs bigger than this are split into page ranges so one long document
+# doesn't keep a single worker busy while the others sit idle
+LARGE_PDF_BYTES = 5 * 1024 * 1024
+PAGES_PER_TASK = 50
+
 # Function to list all pdfs in a directory
 def list_pdfs_in_directory(directory):
     pdf_files = []
@@ -12,25 +21,24 @@ def list_pdfs_in_directory(directory):
     return pdf_files
 
 # Function to extract all pdfs in a directory
-def extract_all_pdfs(directory):
-    all_pages = []
-    pdf_files = list_pdfs_in_directory(directory)
-    for filename in pdf_files:
-        pdf_path = os.path.join(directory, filename)
-        try:
-            pages = extract_text_from_pdf(pdf_path)
-            all_pages.extend(pages)
-        except Exception as e:
-            print(f"Error occurred while processing {filename}: {e}")
+def extract_all_pdfs(directory, workers=None):
+    pdf_files = sorted(list_pdfs_in_directory(directory))
+    paths = [os.path.join(directory, filename) for filename in pdf_files]
+    all_pages, _ = extract_pdfs(paths, workers=workers)
     return all_pages
 
 # Function to extract text from a pdf file
 def extract_text_from_pdf(pdf_path):
+    return extract_page_range(pdf_path)
+
+# Function to extract text from pages [start, end) of a pdf file (page numbers are 1-based)
+def extract_page_range(pdf_path, start=1, end=None):
     pages = []
     with open(pdf_path, 'rb') as p_file:
         reader = pypdf.PdfReader(p_file)
-        for page_num, page in enumerate(reader.pages, start=1):
-            text = page.extract_text()
+        end = len(reader.pages) + 1 if end is None else min(end, len(reader.pages) + 1)
+        for page_num in range(start, end):
+            text = reader.pages[page_num - 1].extract_text()
             if not text:
                 continue
             pages.append({
@@ -40,10 +48,115 @@ def extract_text_from_pdf(pdf_path):
             })
     return pages
 
+def count_pages(pdf_path):
+    with open(pdf_path, 'rb') as p_file:
+        return len(pypdf.PdfReader(p_file).pages)
+
+# Splits the work into (pdf_path, start, end) tasks: one per file, or one per
+# PAGES_PER_TASK pages for large files. Task order = output order.
+def plan_tasks(pdf_paths, pages_per_task=PAGES_PER_TASK):
+    tasks = []
+    for path in pdf_paths:
+        n_pages = None
+        if os.path.getsize(path) > LARGE_PDF_BYTES:
+            try:
+                n_pages = count_pages(path)
+            except Exception:
+                pass  # let the worker hit (and report) the same error
+        if n_pages is None or n_pages <= pages_per_task:
+            tasks.append((path, 1, None))
+        else:
+            for start in range(1, n_pages + 1, pages_per_task):
+                tasks.append((path, start, start + pages_per_task))
+    return tasks
+
+def _run_task(task):
+    # Runs in a worker process; errors are returned, not raised, so one bad
+    # file never cancels the rest of the batch
+    try:
+        return extract_page_range(*task), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+# Extracts a list of pdfs across a process pool.
+# Returns (pages, failed) — pages in input order, failed maps filename → error.
+def extract_pdfs(pdf_paths, workers=None):
+    failed = {}
+    all_pages = [page for pages in iter_extracted_pages(pdf_paths, workers=workers, failed=failed)
+                 for page in pages]
+    return all_pages, failed
+
+# Generator version: yields the page list of each file in input order, keeping
+# at most max_in_flight tasks submitted so results never pile up in memory
+# faster than the caller consumes them. Errors are recorded in `failed`.
+# A file split into page ranges is yielded once its last range is done, and
+# not at all if any range failed, so a partly extracted file is never indexed.
+def iter_extracted_pages(pdf_paths, workers=None, max_in_flight=None, failed=None):
+    tasks = plan_tasks(pdf_paths)
+    failed = {} if failed is None else failed
+    last_task = {task[0]: i for i, task in enumerate(tasks)}  # a file's ranges are consecutive
+    held = []
+    total_bytes = sum(os.path.getsize(path) for path in pdf_paths)
+    started = time.perf_counter()
+    done = n_pages = 0
+
+    def record(task, result):
+        nonlocal done, n_pages
+        pages, error = result
+        done += 1
+        n_pages += len(pages)
+        if error:
+            filename = os.path.basename(task[0])
+            failed[filename] = error
+            print(f"Error occurred while processing {filename}: {error}")
+        rate = n_pages / max(time.perf_counter() - started, 1e-9)
+        print(f"[extract] {done}/{len(tasks)} tasks, {n_pages} pages ({rate:.1f} pages/s)", end="\r")
+        return pages
+
+    def finish(i, task, result):
+        # The file's pages once task i is its last range, else None
+        held.append(record(task, result))
+        if last_task[task[0]] != i:
+            return None
+        pages = [] if os.path.basename(task[0]) in failed else [page for ranges in held for page in ranges]
+        held.clear()
+        return pages
+
+    if workers == 1 or len(tasks) <= 1:
+        for i, task in enumerate(tasks):
+            pages = finish(i, task, _run_task(task))
+            if pages is not None:
+                yield pages
+    else:
+        workers = workers or os.cpu_count() or 1
+        max_in_flight = max_in_flight or 2 * workers
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            task_iter = enumerate(tasks)
+            pending = deque()
+            for i, task in task_iter:
+                pending.append((i, task, pool.submit(_run_task, task)))
+                if len(pending) >= max_in_flight:
+                    break
+            while pending:
+                i, task, future = pending.popleft()
+                next_task = next(task_iter, None)
+                if next_task is not None:
+                    pending.append((*next_task, pool.submit(_run_task, next_task[1])))
+                pages = finish(i, task, future.result())
+                if pages is not None:
+                    yield pages
+
+    elapsed = time.perf_counter() - started
+    if tasks:
+        print()
+    print(f"[extract] {len(pdf_paths)} PDFs, {n_pages} pages in {elapsed:.2f}s "
+          f"({n_pages / max(elapsed, 1e-9):.1f} pages/s, {total_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s), "
+          f"{len(failed)} failed")
+
 if __name__ == "__main__":
     all_pages = extract_all_pdfs(directory)
     print(f"Total pages extracted: {len(all_pages)}")
     if all_pages:
         first = all_pages[0]
         print(f"First page — {first['filename']}, page {first['page_number']}:")
-        print(first['text'][:200])
\ No newline at end of file
+        print(first['text'][:200])
@@ -0,0 +1,332 @@
+''' Incremental on-disk index: only new or changed PDFs are re-extracted, re-chunked and re-embedded '''
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from extract import list_pdfs_in_directory
+from chunk import BM25Index, TOKENIZER_VERSION
+from embed import MODEL_NAME
+from pipeline import EMBED_BATCH_SIZE, batched, stream_into
+from store import ChunkStore, QuantizedMatrix, quantize
+from ann import IVFIndex
+from dedupe import NearDuplicateIndex
+
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index")
+MANIFEST_FILE = "manifest.json"
+CHUNKS_FILE = "chunks.jsonl"
+EMBEDDINGS_FILE = "embeddings.npy"
+ANN_FILE = "ivf.npz"
+# Compact copy of the embeddings searched first ("float16", "int8" or None);
+# the float32 file is kept on disk for re-scoring the top candidates
+QUANTIZATION = "int8"
+QUANTIZED_FILE = "embeddings.{}.npy"
+SCALES_FILE = "embeddings.scales.npy"
+BM25_FILE = "bm25.npz"
+# Near-duplicate chunks are dropped at ingest and listed here against the
+# chunk kept in their place (see dedupe.py); None keeps every chunk
+DEDUPE_THRESHOLD = 0.8
+DUPLICATES_FILE = "duplicates.jsonl"
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(index_dir=INDEX_DIR):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def load_index(index_dir=INDEX_DIR, quantization=QUANTIZATION, mmap=True):
+    ''' Returns the saved index as a ChunkStore, or None if no index has been built.
+    With mmap the embedding files are memory-mapped read-only, so every process
+    (e.g. each Streamlit worker) shares the same OS page cache instead of
+    holding its own copy on the heap. '''
+    manifest = load_manifest(index_dir)
+    if manifest is None:
+        return None
+    chunks = []
+    with open(os.path.join(index_dir, CHUNKS_FILE), encoding="utf-8") as f:
+        for line in f:
+            chunks.append(json.loads(line))
+    mmap_mode = 'r' if mmap else None
+    embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+    quantized = None
+    codes_path = os.path.join(index_dir, QUANTIZED_FILE.format(quantization))
+    if quantization and os.path.exists(codes_path):
+        codes = np.load(codes_path, mmap_mode=mmap_mode)
+        scales = None
+        if quantization == "int8":
+            scales = np.load(os.path.join(index_dir, SCALES_FILE), mmap_mode=mmap_mode)
+        quantized = QuantizedMatrix(codes, scales)
+    bm25_path = os.path.join(index_dir, BM25_FILE)
+    bm25 = BM25Index.load(bm25_path) if os.path.exists(bm25_path) else None
+    if bm25 is not None and bm25.tokenizer != TOKENIZER_VERSION:
+        bm25 = None  # built with an older tokenizer: ChunkStore.lexical rebuilds it
+    row_of = {c['chunk_id']: row for row, c in enumerate(chunks)}
+    locations = {}
+    for duplicate in load_duplicates(index_dir):
+        locations.setdefault(row_of[duplicate['duplicate_of']], []).append({
+            'chunk_id': duplicate['chunk_id'],
+            'filename': duplicate['filename'],
+            'page_number': duplicate['page_number'],
+        })
+    return ChunkStore(
+        embeddings,
+        [c['chunk_id'] for c in chunks],
+        [c['filename'] for c in chunks],
+        [c['page_number'] for c in chunks],
+        [c['chunk_number'] for c in chunks],
+        [c['text'] for c in chunks],
+        quantized=quantized,
+        bm25=bm25,
+        version=corpus_version(manifest),
+        locations=locations,
+    )
+
+def load_duplicates(index_dir=INDEX_DIR):
+    path = os.path.join(index_dir, DUPLICATES_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def corpus_version(manifest):
+    ''' Changes whenever any indexed PDF or the embedding model changes '''
+    files = {name: entry['sha256'] for name, entry in manifest['files'].items()}
+    key = json.dumps({'model': manifest.get('model'), 'files': files, 'dedupe': manifest.get('dedupe')},
+                     sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def load_ann(index_dir=INDEX_DIR, n_probe=None):
+    ''' Returns the saved IVF index, or None to fall back to exact search '''
+    path = os.path.join(index_dir, ANN_FILE)
+    if not os.path.exists(path):
+        return None
+    return IVFIndex.load(path, n_probe=n_probe)
+
+class IndexWriter:
+    ''' Appends chunks + embeddings to temp files batch by batch, so an index
+    of any size is written with flat memory. close() converts the raw arrays
+    to .npy and swaps every file into place; the manifest goes last, so a
+    crash mid-build never leaves a half-written index. Swapping (not
+    overwriting) also leaves processes that have the old files memory-mapped
+    reading a consistent snapshot. '''
+
+    def __init__(self, index_dir=INDEX_DIR, quantization=QUANTIZATION):
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir = index_dir
+        self.quantization = quantization
+        self.n_rows = 0
+        self.dim = None
+        self._chunks = open(self._path(CHUNKS_FILE) + ".tmp", "w", encoding="utf-8")
+        self._duplicates = open(self._path(DUPLICATES_FILE) + ".tmp", "w", encoding="utf-8")
+        self._bm25 = BM25Index()  # the lexical index is built alongside, from the same rows
+        # target file → (raw temp file, dtype, is a per-row vector rather than a matrix)
+        self._arrays = {EMBEDDINGS_FILE: (open(self._path(EMBEDDINGS_FILE) + ".raw", "wb"), np.float32, False)}
+        if quantization:
+            name = QUANTIZED_FILE.format(quantization)
+            dtype = np.int8 if quantization == "int8" else np.float16
+            self._arrays[name] = (open(self._path(name) + ".raw", "wb"), dtype, False)
+            if quantization == "int8":
+                self._arrays[SCALES_FILE] = (open(self._path(SCALES_FILE) + ".raw", "wb"), np.float32, True)
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def append(self, chunks, embeddings=None):
+        if not chunks:
+            return
+        if embeddings is None:
+            embeddings = np.stack([np.asarray(c['embedding'], dtype=np.float32) for c in chunks])
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.dim = embeddings.shape[1]
+        for chunk in chunks:
+            self._chunks.write(json.dumps({k: v for k, v in chunk.items() if k != 'embedding'}) + "\n")
+        self._bm25.add(chunk['text'] for chunk in chunks)
+        self._arrays[EMBEDDINGS_FILE][0].write(embeddings.tobytes())
+        if self.quantization:
+            codes, scales = quantize(embeddings, self.quantization)
+            self._arrays[QUANTIZED_FILE.format(self.quantization)][0].write(codes.tobytes())
+            if scales is not None:
+                self._arrays[SCALES_FILE][0].write(scales.tobytes())
+        self.n_rows += len(chunks)
+
+    def add_duplicates(self, duplicates):
+        ''' Records chunks left out as near-duplicates (text and embedding are not kept) '''
+        for chunk in duplicates:
+            self._duplicates.write(json.dumps({k: v for k, v in chunk.items()
+                                               if k not in ('text', 'embedding')}) + "\n")
+
+    def close(self, manifest):
+        self._chunks.close()
+        self._duplicates.close()
+        for name, (raw, dtype, is_vector) in self._arrays.items():
+            raw.close()
+            shape = (self.n_rows,) if is_vector else (self.n_rows, self.dim or 0)
+            raw_to_npy(raw.name, self._path(name) + ".tmp", dtype, shape)
+            os.remove(raw.name)
+        with open(self._path(BM25_FILE) + ".tmp", "wb") as f:
+            self._bm25.finalize().save(f)
+        os.replace(self._path(CHUNKS_FILE) + ".tmp", self._path(CHUNKS_FILE))
+        os.replace(self._path(DUPLICATES_FILE) + ".tmp", self._path(DUPLICATES_FILE))
+        os.replace(self._path(BM25_FILE) + ".tmp", self._path(BM25_FILE))
+        for name in self._arrays:
+            os.replace(self._path(name) + ".tmp", self._path(name))
+
+        for dtype in ("float16", "int8"):  # drop copies in a format no longer configured
+            stale = self._path(QUANTIZED_FILE.format(dtype))
+            if dtype != self.quantization and os.path.exists(stale):
+                os.remove(stale)
+        # An ANN index built over the old embeddings would point at the wrong rows
+        if os.path.exists(self._path(ANN_FILE)):
+            os.remove(self._path(ANN_FILE))
+            print("Removed stale ANN index - rebuild it with `python ann.py`")
+
+        manifest_path = self._path(MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def abort(self):
+        for f in (self._chunks, self._duplicates):
+            f.close()
+            os.remove(f.name)
+        for raw, _, _ in self._arrays.values():
+            raw.close()
+            os.remove(raw.name)
+
+def raw_to_npy(raw_path, npy_path, dtype, shape, block_size=1 << 24):
+    # Prepends an .npy header to the raw bytes, copying in blocks
+    with open(npy_path, "wb") as out, open(raw_path, "rb") as raw:
+        np.lib.format.write_array_header_1_0(out, {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            'fortran_order': False,
+            'shape': shape,
+        })
+        shutil.copyfileobj(raw, out, block_size)
+
+def save_index(chunks, manifest, index_dir=INDEX_DIR, quantization=QUANTIZATION):
+    writer = IndexWriter(index_dir, quantization)
+    for batch in batched(chunks, EMBED_BATCH_SIZE):
+        writer.append(batch)
+    writer.close(manifest)
+
+def copy_chunks(index_dir, writer, keep_files, batch_size=EMBED_BATCH_SIZE, deduper=None):
+    ''' Streams the saved chunks of keep_files into writer without loading the
+    whole old index: metadata line by line, embeddings from a memory map.
+    With a deduper, the copied chunks are registered as representatives so
+    new files are deduplicated against them, and their duplicates carried over. '''
+    embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode='r')
+    batch, rows = [], []
+    n_copied = 0
+    with open(os.path.join(index_dir, CHUNKS_FILE), encoding="utf-8") as f:
+        for row, line in enumerate(f):
+            chunk = json.loads(line)
+            if chunk['filename'] not in keep_files:
+                continue
+            batch.append(chunk)
+            rows.append(row)
+            if deduper is not None:
+                deduper.add(chunk)
+            if len(batch) == batch_size:
+                writer.append(batch, embeddings[rows])
+                n_copied += len(batch)
+                batch, rows = [], []
+    if batch:
+        writer.append(batch, embeddings[rows])
+        n_copied += len(batch)
+    if deduper is not None:
+        writer.add_duplicates(d for d in load_duplicates(index_dir) if d['filename'] in keep_files)
+    return n_copied
+
+def orphaned_files(duplicates, keep_files):
+    ''' Kept files with duplicates whose representative is going away. Those
+    files are re-ingested, which also re-checks them against what remains;
+    the loop catches chains where a re-ingested file held representatives too. '''
+    keep_files = set(keep_files)
+    orphaned = set()
+    while True:
+        stale = {d['filename'] for d in duplicates
+                 if d['filename'] in keep_files and d['duplicate_of_file'] not in keep_files}
+        if not stale:
+            return sorted(orphaned)
+        orphaned |= stale
+        keep_files -= stale
+
+def diff_directory(directory, old_files):
+    ''' Compares the PDFs on disk with the manifest entries.
+    Returns (files, changed, deleted) where files is the new manifest section. '''
+    files, changed = {}, []
+    for filename in sorted(list_pdfs_in_directory(directory)):
+        path = os.path.join(directory, filename)
+        stat = os.stat(path)
+        entry = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        old = old_files.get(filename)
+        # Size + mtime match → trust the stored hash without reading the file
+        if old and old['size'] == entry['size'] and old['mtime'] == entry['mtime']:
+            entry['sha256'] = old['sha256']
+        else:
+            entry['sha256'] = file_sha256(path)
+            if not old or old['sha256'] != entry['sha256']:
+                changed.append(filename)
+        files[filename] = entry
+    deleted = [name for name in old_files if name not in files]
+    return files, changed, deleted
+
+def build_index(directory, index_dir=INDEX_DIR):
+    ''' Loads the saved index, first refreshing it if any PDF in the
+    directory was added, changed or removed since the last build.
+    Unchanged files' chunks are copied across; new/changed files are streamed
+    through extract → chunk → embed straight into the new index files. '''
+    manifest = load_manifest(index_dir)
+    # A different embedding model makes every stored vector unusable, and a
+    # different dedupe setting changes which chunks should be in the index
+    reusable = (manifest is not None and manifest.get('model') == MODEL_NAME
+                and manifest.get('dedupe') == DEDUPE_THRESHOLD)
+    old_files = manifest['files'] if reusable else {}
+
+    files, changed, deleted = diff_directory(directory, old_files)
+    if reusable and not changed and not deleted and files == old_files:
+        store = load_index(index_dir)
+        print(f"Index up to date: {len(files)} PDFs, {len(store)} chunks")
+        return store
+
+    unchanged = len(files) - len(changed)
+    keep_files = set(files) - set(changed)
+    deduper = NearDuplicateIndex(DEDUPE_THRESHOLD) if DEDUPE_THRESHOLD else None
+    reingest = orphaned_files(load_duplicates(index_dir), keep_files) if reusable and deduper else []
+    keep_files -= set(reingest)
+    failed = {}
+    writer = IndexWriter(index_dir)
+    try:
+        n_chunks = copy_chunks(index_dir, writer, keep_files, deduper=deduper) if reusable and keep_files else 0
+        n_chunks += stream_into(writer, [os.path.join(directory, name) for name in changed + reingest],
+                                failed=failed, deduper=deduper)
+        # Failed files are left out of the manifest so the next build retries them;
+        # none of their pages were streamed in (see extract.iter_extracted_pages)
+        for filename in failed:
+            files.pop(filename)
+        writer.close({'model': MODEL_NAME, 'files': files, 'dedupe': DEDUPE_THRESHOLD})
+    except BaseException:
+        writer.abort()
+        raise
+
+    print(f"Index updated: {len(changed)} new/changed, {len(deleted)} deleted, "
+          f"{unchanged - len(reingest)} unchanged PDFs → {n_chunks} chunks")
+    if reingest:
+        print(f"Re-ingested {len(reingest)} PDFs whose duplicate chunks pointed into changed files")
+    if deduper is not None:
+        print(deduper.summary())
+    return load_index(index_dir)
+
+if __name__ == "__main__":
+    from extract import directory
+    chunks = build_index(directory)
+    print(f"Total chunks in index: {len(chunks)}")
@@ -0,0 +1,95 @@
+''' Streaming extract → chunk → embed pipeline with bounded memory.
+
+Pages stream out of the extraction pool into the chunker, chunks are grouped
+into fixed-size batches, and each batch is embedded and handed to a writer
+before the next one is taken. Extraction + chunking run in a producer thread
+that feeds a bounded queue: when embedding falls behind, the queue fills and
+the producer blocks (backpressure), so at most QUEUE_BATCHES batches plus the
+extraction pool's in-flight tasks are ever held in memory, however large the
+corpus is.
+'''
+import queue
+import threading
+import time
+from itertools import islice
+from extract import iter_extracted_pages
+from chunk import iter_chunks
+from embed import embed_chunks
+
+EMBED_BATCH_SIZE = 256
+QUEUE_BATCHES = 4
+_DONE = object()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def iter_pages(page_lists):
+    for pages in page_lists:
+        yield from pages
+
+def iter_chunk_batches(pdf_paths, batch_size=EMBED_BATCH_SIZE, workers=None, failed=None,
+                       max_queued=QUEUE_BATCHES):
+    ''' Yields lists of up to batch_size chunks (without embeddings), in input order '''
+    batches = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+
+    def put(item):
+        # Blocks while the queue is full; the timeout lets the producer notice
+        # when the consumer has stopped reading. Returns False in that case.
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            pages = iter_pages(iter_extracted_pages(pdf_paths, workers=workers, failed=failed))
+            for batch in batched(iter_chunks(pages), batch_size):
+                if not put(batch):
+                    return
+            put(_DONE)
+        except BaseException as e:  # re-raised in the consumer
+            put(e)
+
+    producer = threading.Thread(target=produce, name="chunk-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+def stream_into(writer, pdf_paths, batch_size=EMBED_BATCH_SIZE, workers=None, failed=None, deduper=None):
+    ''' Embeds chunks from pdf_paths batch by batch and appends them to writer
+    (anything with an append(chunks) method, e.g. index.IndexWriter).
+    With a deduper (dedupe.NearDuplicateIndex), near-duplicates are dropped
+    before embedding and passed to writer.add_duplicates instead.
+    Returns the number of chunks written. '''
+    started = time.perf_counter()
+    n_chunks = 0
+    for batch in iter_chunk_batches(pdf_paths, batch_size=batch_size, workers=workers, failed=failed):
+        if deduper is not None:
+            batch, duplicates = deduper.dedupe(batch)
+            writer.add_duplicates(duplicates)
+        if batch:
+            writer.append(embed_chunks(batch, verbose=False))
+        n_chunks += len(batch)
+    elapsed = time.perf_counter() - started
+    print(f"[pipeline] {n_chunks} chunks embedded and written in {elapsed:.2f}s "
+          f"({n_chunks / max(elapsed, 1e-9):.1f} chunks/s)")
+    return n_chunks
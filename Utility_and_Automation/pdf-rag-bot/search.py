@@ -1,35 +1,130 @@
 # Search logic for the PDF RAG bot
-import os
 import numpy as np
-from embed import model, embed_chunks
+from embed import encode_texts
+from store import ChunkStore
+from ann import ExactIndex, top_k_indices
+
+# With a quantized store, this many candidates per requested result are
+# re-scored against the float32 embeddings before the final top-k is taken
+RESCORE_FACTOR = 4
+
+# Retrieval modes:
+#   dense     - embedding similarity over every chunk (or an ANN index)
+#   bm25      - lexical BM25 only; exact part numbers / clause ids
+#   prefilter - BM25 picks PREFILTER_CANDIDATES chunks, dense similarity ranks them
+#   hybrid    - dense and BM25 top FUSION_DEPTH lists merged by reciprocal rank fusion
+MODES = ("dense", "bm25", "prefilter", "hybrid")
+PREFILTER_CANDIDATES = 200
+FUSION_DEPTH = 50
+RRF_K = 60
+
+def rescore(query_matrix, embeddings, candidates, top_k):
+    indices = np.full((len(query_matrix), top_k), -1, dtype=np.int64)
+    scores = np.full((len(query_matrix), top_k), -np.inf, dtype=np.float32)
+    for qi, (query, row) in enumerate(zip(query_matrix, candidates)):
+        row = np.sort(row[row >= 0])  # sorted reads keep the memmap access sequential
+        if len(row) == 0:
+            continue
+        exact = np.asarray(embeddings[row], dtype=np.float32) @ query
+        best = top_k_indices(exact, top_k)[0]
+        indices[qi, :len(best)] = row[best]
+        scores[qi, :len(best)] = exact[best]
+    return indices, scores
+
+def dense_search(query_matrix, store, top_k, index=None):
+    index = index if index is not None else ExactIndex()
+    if store.quantized is None:
+        return index.search(query_matrix, store.embeddings, top_k)
+    candidates, _ = index.search(query_matrix, store.quantized, top_k * RESCORE_FACTOR)
+    return rescore(query_matrix, store.embeddings, candidates, top_k)
+
+def prefilter_search(query, query_embedding, store, top_k, n_candidates=PREFILTER_CANDIDATES):
+    ''' Dense scoring restricted to the chunks BM25 finds for the query text '''
+    candidates, _ = store.lexical.search(query, n_candidates)
+    if len(candidates) == 0:  # no lexical match at all - fall back to a full dense scan
+        return None
+    indices, scores = rescore(query_embedding[None, :], store.embeddings, candidates[None, :], top_k)
+    return indices[0], scores[0]
+
+def hybrid_search(query, query_embedding, store, top_k, index=None, depth=FUSION_DEPTH):
+    ''' Reciprocal rank fusion of the dense and BM25 rankings: each list
+    contributes 1 / (RRF_K + rank), so neither score scale dominates '''
+    dense_indices, _ = dense_search(query_embedding[None, :], store, depth, index)
+    lexical_indices, _ = store.lexical.search(query, depth)
+    fused = {}
+    for ranking in (dense_indices[0], lexical_indices):
+        for rank, i in enumerate(i for i in ranking if i >= 0):
+            fused[int(i)] = fused.get(int(i), 0.0) + 1.0 / (RRF_K + rank + 1)
+    best = sorted(fused.items(), key=lambda item: (-item[1], -item[0]))[:top_k]
+    return np.array([i for i, _ in best], dtype=np.int64), np.array([f for _, f in best], dtype=np.float32)
+
+def to_results(store, indices, scores):
+    hits = []
+    for i, score in zip(indices, scores):
+        if i < 0:  # an approximate index can return fewer than top_k hits
+            continue
+        result = store[i]
+        result['score'] = float(score)
+        hits.append(result)
+    return hits
+
+def search_by_embedding(query_embeddings, chunks, top_k=5, index=None, queries=None, mode="dense"):
+    ''' Scores a batch of (normalized) query embeddings against the chunks.
+    index is any ann.py index (default: exact matrix multiply over every chunk).
+    mode is one of MODES; all but "dense" also need the query texts.
+    Returns one result list per query. '''
+    if mode not in MODES:
+        raise ValueError(f"unknown search mode {mode!r} (use one of {', '.join(MODES)})")
+    store = ChunkStore.from_chunks(chunks)
+    if len(store) == 0:
+        return [[] for _ in range(len(query_embeddings))]
+    query_matrix = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+    if mode == "dense":
+        indices, scores = dense_search(query_matrix, store, top_k, index)
+        return [to_results(store, i, s) for i, s in zip(indices, scores)]
+    if mode == "bm25":
+        return lexical_search(queries, store, top_k=top_k)
 
-def search_chunks(query, chunks, top_k=5):
-    query_embedding = model.encode([query], convert_to_tensor=False, normalize_embeddings=True)[0]
-    similarities = [np.dot(query_embedding, chunk['embedding']) for chunk in chunks]
-    top_indices = np.argsort(similarities)[-top_k:][::-1]
     results = []
-    for i in top_indices:
-        result = chunks[i].copy()
-        result['score'] = float(similarities[i])
-        results.append(result)
+    for query, query_embedding in zip(queries, query_matrix):
+        if mode == "hybrid":
+            hit = hybrid_search(query, query_embedding, store, top_k, index)
+        else:
+            hit = prefilter_search(query, query_embedding, store, top_k)
+            if hit is None:
+                hit = tuple(a[0] for a in dense_search(query_embedding[None, :], store, top_k, index))
+        results.append(to_results(store, *hit))
     return results
 
+def lexical_search(queries, chunks, top_k=5):
+    ''' BM25 only - no query embedding needed '''
+    store = ChunkStore.from_chunks(chunks)
+    return [to_results(store, *store.lexical.search(query, top_k)) for query in queries]
+
+def search_batch(queries, chunks, top_k=5, index=None, mode="dense"):
+    queries = list(queries)
+    if mode == "bm25":
+        return lexical_search(queries, chunks, top_k=top_k)
+    query_embeddings = encode_texts(queries)
+    return search_by_embedding(query_embeddings, chunks, top_k=top_k, index=index, queries=queries, mode=mode)
+
+def search_chunks(query, chunks, top_k=5, index=None, mode="dense"):
+    return search_batch([query], chunks, top_k=top_k, index=index, mode=mode)[0]
+
 if __name__ == "__main__":
-    from extract import extract_all_pdfs, directory
-    from chunk import chunk_all_pages
-    from embed import embed_chunks
+    from extract import directory
+    from index import build_index, load_ann
 
-    # Extract and chunk the PDFs
-    pages = extract_all_pdfs(directory)
-    chunks = chunk_all_pages(pages)
-    chunks = embed_chunks(chunks)
+    # Load the saved index (re-processing only new or changed PDFs)
+    chunks = build_index(directory)
+    ann_index = load_ann()
 
     # Example search query
     query = "What is the Bristol Local Plan Review about?"
-    results = search_chunks(query, chunks, top_k=3)
-    
+    results = search_chunks(query, chunks, top_k=3, index=ann_index)
+
     print(f"Top {len(results)} results for query: '{query}'")
     for i, result in enumerate(results):
         print(f"Result {i+1} — {result['filename']} p{result['page_number']} (score: {result['score']:.3f})")
         print(result['text'][:200])
-        print("---")
\ No newline at end of file
+        print("---")
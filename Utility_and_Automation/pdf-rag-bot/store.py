@@ -0,0 +1,136 @@
+''' Chunk store: one contiguous embedding matrix + parallel metadata arrays,
+optionally memory-mapped from disk and with a quantized copy for scoring '''
+import hashlib
+import numpy as np
+from chunk import BM25Index
+
+SCORE_BLOCK = 16384  # rows dequantized at a time when scoring a quantized matrix
+
+
+def quantize(embeddings, dtype):
+    ''' Returns (codes, scales). float16 needs no scale; int8 uses one
+    symmetric scale per row so each vector keeps its full 8-bit range. '''
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dtype == "float16":
+        return embeddings.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127.0 if len(embeddings) else np.zeros(0, dtype=np.float32)
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"unknown quantization {dtype!r} (use 'float16' or 'int8')")
+
+
+class QuantizedMatrix:
+    ''' A float16 or int8 copy of the embedding matrix (2-4x smaller).
+
+    Row lookups return dequantized float32, and scores() works through the
+    matrix in blocks, so the full float32 matrix is never materialised. '''
+
+    def __init__(self, codes, scales=None):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        block = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows], dtype=np.float32)[..., None]
+        return block
+
+    def scores(self, query_matrix):
+        out = np.empty((len(query_matrix), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK):
+            end = min(start + SCORE_BLOCK, len(self))
+            out[:, start:end] = query_matrix @ self[start:end].T
+        return out
+
+
+class ChunkStore:
+    ''' Row i of `embeddings` belongs to chunk_ids[i], filenames[i], page_numbers[i], ...
+
+    When `quantized` is set, searches score against it first and only
+    re-read the float32 rows of the best candidates (see search.py).
+    `bm25` is the lexical index over the same rows (chunk.BM25Index).
+    `locations` maps a row to the other places its text appears (near-duplicate
+    chunks dropped at ingest, see dedupe.py); they come back as 'also_in'.
+    Indexing or iterating yields the same chunk dicts the rest of the
+    pipeline uses, so a store can be passed anywhere a list of chunks was. '''
+
+    def __init__(self, embeddings, chunk_ids, filenames, page_numbers, chunk_numbers, texts, quantized=None,
+                 bm25=None, version=None, locations=None):
+        # asarray (not ascontiguousarray) so a read-only np.memmap stays mapped
+        # instead of being copied onto the heap
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.quantized = quantized
+        self.bm25 = bm25
+        self.locations = locations or {}
+        self._version = version
+        self.chunk_ids = list(chunk_ids)
+        self.filenames = list(filenames)
+        self.page_numbers = np.asarray(page_numbers, dtype=np.int32)
+        self.chunk_numbers = np.asarray(chunk_numbers, dtype=np.int32)
+        self.texts = list(texts)
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        if isinstance(chunks, cls):
+            return chunks
+        if chunks:
+            embeddings = np.stack([np.asarray(c['embedding'], dtype=np.float32) for c in chunks])
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        return cls(
+            embeddings,
+            [c.get('chunk_id') for c in chunks],
+            [c.get('filename') for c in chunks],
+            [c.get('page_number', 0) for c in chunks],
+            [c.get('chunk_number', 0) for c in chunks],
+            [c['text'] for c in chunks],
+        )
+
+    @property
+    def lexical(self):
+        ''' BM25 index over the chunk texts (saved with the index, or built on first use) '''
+        if self.bm25 is None:
+            self.bm25 = BM25Index().add(self.texts).finalize()
+        return self.bm25
+
+    @property
+    def version(self):
+        ''' Corpus version for cache keys: the manifest hash for a saved index,
+        otherwise a hash of the chunk ids and texts '''
+        if self._version is None:
+            digest = hashlib.sha256()
+            for chunk_id, text in zip(self.chunk_ids, self.texts):
+                digest.update(f"{chunk_id}\x00{text}\x00".encode("utf-8"))
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        return {
+            'chunk_id': self.chunk_ids[i],
+            'filename': self.filenames[i],
+            'page_number': int(self.page_numbers[i]),
+            'chunk_number': int(self.chunk_numbers[i]),
+            'text': self.texts[i],
+            'embedding': self.embeddings[i],
+            'also_in': list(self.locations.get(i, ())),
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,134 @@
+''' Local stand-in for the Anthropic Messages API, for working offline and for
+latency measurements that don't depend on the real service.
+
+Implements POST /v1/messages in both the plain JSON and the streaming (SSE)
+formats the anthropic client understands. The reply echoes the start of the
+question back as a fixed number of words, with a configurable delay before
+the first token and between tokens, so time-to-first-token and total time
+can be compared between ask_claude and ask_claude_stream.
+
+    python stub_llm.py --port 8765 --first-token-ms 400 --token-ms 20
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub python Rag_bot.py
+'''
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+FIRST_TOKEN_SECONDS = 0.4
+TOKEN_SECONDS = 0.02
+ANSWER_WORDS = 60
+
+
+def make_answer(prompt, n_words=ANSWER_WORDS):
+    question = prompt.rsplit("Question:", 1)[-1].split("Answer:", 1)[0].strip()
+    words = f"Stub answer to: {question}".split()
+    filler = "lorem ipsum dolor sit amet consectetur adipiscing elit".split()
+    while len(words) < n_words:
+        words.append(filler[len(words) % len(filler)])
+    return [w + " " for w in words[:n_words]]
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    first_token_seconds = FIRST_TOKEN_SECONDS
+    token_seconds = TOKEN_SECONDS
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/v1/messages":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "".join(
+            m["content"] if isinstance(m["content"], str) else "".join(b.get("text", "") for b in m["content"])
+            for m in body.get("messages", [])
+        )
+        tokens = make_answer(prompt)
+        message = {
+            "id": f"msg_stub_{threading.get_ident()}_{time.monotonic_ns()}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(prompt.split()), "output_tokens": 0},
+        }
+        if body.get("stream"):
+            self._stream(message, tokens)
+        else:
+            self._reply(message, tokens)
+
+    def _reply(self, message, tokens):
+        time.sleep(self.first_token_seconds + self.token_seconds * (len(tokens) - 1))
+        message.update(content=[{"type": "text", "text": "".join(tokens)}], stop_reason="end_turn")
+        message["usage"]["output_tokens"] = len(tokens)
+        payload = json.dumps(message).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, message, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        self.wfile.write(sse("message_start", {"type": "message_start", "message": dict(message, content=[])}))
+        self.wfile.write(sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                                     "content_block": {"type": "text", "text": ""}}))
+        self.wfile.flush()
+        time.sleep(self.first_token_seconds)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_seconds)
+            self.wfile.write(sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                         "delta": {"type": "text_delta", "text": token}}))
+            self.wfile.flush()
+        self.wfile.write(sse("content_block_stop", {"type": "content_block_stop", "index": 0}))
+        self.wfile.write(sse("message_delta", {"type": "message_delta",
+                                               "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                               "usage": {"output_tokens": len(tokens)}}))
+        self.wfile.write(sse("message_stop", {"type": "message_stop"}))
+        self.wfile.flush()
+
+
+def serve(port=DEFAULT_PORT, first_token_seconds=FIRST_TOKEN_SECONDS, token_seconds=TOKEN_SECONDS,
+          background=False):
+    ''' Starts the stub server. With background=True it runs in a daemon thread
+    and the server is returned (call .shutdown() to stop it). '''
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "first_token_seconds": first_token_seconds,
+        "token_seconds": token_seconds,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+        return server
+    print(f"Stub LLM listening on http://127.0.0.1:{server.server_address[1]} "
+          f"(first token {first_token_seconds * 1000:.0f} ms, {token_seconds * 1000:.0f} ms/token)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--first-token-ms", type=float, default=FIRST_TOKEN_SECONDS * 1000)
+    parser.add_argument("--token-ms", type=float, default=TOKEN_SECONDS * 1000)
+    args = parser.parse_args()
+    serve(args.port, args.first_token_ms / 1000, args.token_ms / 1000)
@@ -0,0 +1,34 @@
+from dedupe import NearDuplicateIndex, shingles
+
+
+def make_chunks(texts):
+    return [{'chunk_id': f"doc.pdf_p{i}_c1", 'filename': "doc.pdf", 'text': text} for i, text in enumerate(texts)]
+
+
+def test_non_ascii_chunks_are_not_duplicates():
+    texts = [
+        "The local plan sets out where new homes and employment land will be allocated.",
+        "Местный план определяет, где будут построены новые дома и промышленные зоны.",
+        "地域計画は新しい住宅と雇用用地の配置を定めるものです。",
+        "Το τοπικό σχέδιο ορίζει πού θα κατασκευαστούν νέες κατοικίες.",
+        "---- | ---- | ---- *** ////",
+        "==== ++++ ====",
+    ]
+    kept, duplicates = NearDuplicateIndex().dedupe(make_chunks(texts))
+    assert duplicates == []
+    assert [c['text'] for c in kept] == texts
+
+
+def test_non_ascii_words_are_shingled_whole():
+    assert shingles("Größe über Straße", k=3) == {"größe über straße"}
+    assert shingles("---- ***") == set()
+
+
+def test_near_duplicates_are_still_found():
+    page = ("Bristol Local Plan Review: policies for housing, transport and green infrastructure "
+            "across the city, with site allocations listed by ward. Page {}")
+    russian = "Местный план Бристоля: жильё, транспорт и зелёная инфраструктура по всему городу. Страница {}"
+    texts = [page.format(1), russian.format(1), page.format(2), russian.format(2)]
+    kept, duplicates = NearDuplicateIndex(threshold=0.5).dedupe(make_chunks(texts))
+    assert [c['text'] for c in kept] == [page.format(1), russian.format(1)]
+    assert [d['duplicate_of'] for d in duplicates] == ["doc.pdf_p0_c1", "doc.pdf_p1_c1"]
@@ -2,12 +2,14 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 import pandas as pd
 #This is to auomatically save the file with the current date
 from datetime import datetime
+import argparse
 import os
 import sys
+import time
+from teasers import MODES, extract_teasers
 
 application_path = os.path.dirname(sys.executable)
 now = datetime.now().strftime("%d-%m-%Y")#current date in dd-mm-yyyy format
@@ -15,45 +17,35 @@ now = datetime.now().strftime("%d-%m-%Y")#current date in dd-mm-yyyy format
 website = "https://www.thesun.co.uk/sport/football/"
 path = "C:/Users/AH0514/OneDrive - Mubea/Desktop/chromedriver-win64/chromedriver.exe"
 
-#headless mode (ie without opening a browser window)
-options = Options()
-options.add_argument("--headless=new")
+def make_driver():
+    #headless mode (ie without opening a browser window)
+    options = Options()
+    options.add_argument("--headless=new")
+    # Falls back to Selenium Manager finding a chromedriver when the path above doesn't exist
+    service = Service(executable_path=path) if os.path.exists(path) else Service()
+    return webdriver.Chrome(service=service, options=options)
 
-service = Service(executable_path=path)
-driver = webdriver.Chrome(service=service, options=options)
-driver.get(website)
+def scrape(driver, url=website, mode="script"):
+    # "script" and "source" read every teaser in one WebDriver round trip;
+    # "elements" is the old one-call-per-field version (see teasers.py)
+    driver.get(url)
+    rows = extract_teasers(driver, mode)
+    return pd.DataFrame(rows, columns=["Title", "Subitle", "Link"])
 
-containers = driver.find_elements("xpath", '//div[@class="teaser__copy-container"]')
-Titles = []
-Subitles = []
-Links = []
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape football headlines to a dated CSV")
+    parser.add_argument("--url", default=website)
+    parser.add_argument("--mode", choices=MODES, default="script", help="how teasers are read from the page")
+    args = parser.parse_args()
 
-for container in containers:
+    driver = make_driver()
     try:
-        Title = container.find_element(By.XPATH, './/span').text
-    except:
-        Title = None
-    try:
-        Subitle = container.find_element(By.XPATH, './/h3').text
-    except:
-        Subitle = None
-    try:
-        Link = container.find_element(By.XPATH, './/a').get_attribute("href")
-    except:
-        Link = None
-    Titles.append(Title)
-    Subitles.append(Subitle)
-    Links.append(Link)
-    
-my_dict = {
-    "Title": Titles,
-    "Subitle": Subitles,
-    "Link": Links
-}
-    
-df_headline = pd.DataFrame(my_dict)
-file_name = f"Football_headlines_{now}.csv"
-finalPath = os.path.join(application_path, file_name)
+        started = time.perf_counter()
+        df_headline = scrape(driver, args.url, args.mode)
+        print(f"{len(df_headline)} headlines in {time.perf_counter() - started:.2f}s ({args.mode})")
+    finally:
+        driver.quit()
 
-df_headline.to_csv(finalPath)
-driver.quit()
+    file_name = f"Football_headlines_{now}.csv"
+    finalPath = os.path.join(application_path, file_name)
+    df_headline.to_csv(finalPath)
@@ -0,0 +1,138 @@
+# Times the teaser extraction modes against the fixture pages in fixtures/.
+#
+#   python benchmark.py                  # every fixture, 5 repeats
+#   python benchmark.py --repeat 20
+#   python benchmark.py multi            # serial vs parallel multi-section scraping
+#   python benchmark.py incremental      # full vs conditional re-scrapes with a seen-links store
+#
+# Local parsing is always timed. With Selenium and Chrome installed the
+# fixtures are also opened in headless Chrome (file:// URLs), and the three
+# modes are timed end to end and checked to return the same rows.
+import argparse
+import os
+import tempfile
+import time
+from teasers import MODES, extract_teasers, parse_teasers
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BASE_URL = "https://www.thesun.co.uk/sport/football/"
+
+
+def fixtures():
+    return sorted(os.path.join(FIXTURE_DIR, f) for f in os.listdir(FIXTURE_DIR) if f.endswith(".html"))
+
+def normalise(rows):
+    # WebElement.text keeps line breaks inside a field; the local parser folds them
+    return [tuple(" ".join(v.split()) if isinstance(v, str) else v for v in row) for row in rows]
+
+def best_of(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000, result
+
+def bench_parse(repeat):
+    print("Local parse of fixture HTML (page_source mode, no browser):")
+    for fixture in fixtures():
+        with open(fixture, encoding="utf-8") as f:
+            html = f.read()
+        ms, rows = best_of(lambda: parse_teasers(html, BASE_URL), repeat)
+        print(f"  {os.path.basename(fixture):>20}  {len(html) / 1024:6.0f} KB  {len(rows):4d} teasers  {ms:7.1f} ms")
+
+def bench_driver(repeat):
+    try:
+        from Webscraper_Auto import make_driver
+        driver = make_driver()
+    except Exception as e:  # selenium missing, or no Chrome / chromedriver on this machine
+        print(f"Skipping browser timings: {type(e).__name__}: {e}")
+        return
+    try:
+        print("Headless Chrome, fixture opened via file:// (WebDriver round trips per extraction):")
+        for fixture in fixtures():
+            driver.get("file://" + fixture)
+            results = {}
+            for mode in MODES:
+                ms, rows = best_of(lambda: extract_teasers(driver, mode), repeat)
+                results[mode] = (ms, rows)
+            n = len(results["elements"][1])
+            baseline = results["elements"][0]
+            print(f"  {os.path.basename(fixture)}: {n} teasers")
+            for mode, (ms, rows) in results.items():
+                round_trips = 1 + 3 * n if mode == "elements" else 1
+                same = "same rows" if normalise(rows) == normalise(results["elements"][1]) else "ROWS DIFFER"
+                print(f"    {mode:>8}  {round_trips:5d} round trips  {ms:8.1f} ms  "
+                      f"{baseline / ms:5.1f}x  {same}")
+    finally:
+        driver.quit()
+
+def bench_multi(n_sections=16, delay_ms=200, port=8800):
+    # Sections come from the local fixture server (with simulated latency),
+    # split over two host names so the per-host limit applies to each separately
+    import fixture_server
+    from multi_scrape import load_sections, merge, scrape_all
+    server = fixture_server.serve(port, delay_ms, background=True)
+    try:
+        hosts = (f"127.0.0.1:{port}", f"localhost:{port}")
+        urls = [f"http://{hosts[i % 2]}/section/s{i}/" for i in range(n_sections)]
+        sections = load_sections(urls=urls)
+        print(f"{n_sections} sections over HTTP, {delay_ms} ms server latency, 2 hosts:")
+        for workers, per_host in ((1, 0), (4, 0), (8, 0), (8, 4)):
+            started = time.perf_counter()
+            results, failed = scrape_all(sections, workers=workers, per_host_per_second=per_host)
+            elapsed = time.perf_counter() - started
+            rows = merge(sections, results)
+            limit = f"{per_host:g}/s per host" if per_host else "no rate limit"
+            print(f"  {workers} workers, {limit:>16}  {elapsed:6.2f}s  {sum(map(len, results))} teasers "
+                  f"→ {len(rows)} merged, {len(failed)} failed")
+    finally:
+        server.shutdown()
+
+def bench_incremental(n_sections=16, delay_ms=200, port=8800):
+    # A cold run, a re-run with nothing changed, and a re-run after two
+    # sections publish a story, against a fresh seen-links database
+    import fixture_server
+    from multi_scrape import load_sections, record, scrape_all
+    from seen_store import SeenStore
+    server = fixture_server.serve(port, delay_ms, background=True)
+    try:
+        urls = [f"http://127.0.0.1:{port}/section/s{i}/" for i in range(n_sections)]
+        sections = load_sections(urls=urls)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SeenStore(os.path.join(tmp, "seen.db"))
+            print(f"{n_sections} sections over HTTP, {delay_ms} ms server latency, 8 workers:")
+            for label in ("first run", "unchanged", "2 new stories", "full re-scrape"):
+                if label == "2 new stories":
+                    fixture_server.publish(server, "s3", "Late winner sends City top")
+                    fixture_server.publish(server, "s11", "Keeper signs new deal")
+                incremental = label != "full re-scrape"
+                sent, not_modified = server.stats["bytes_sent"], server.stats["not_modified"]
+                started = time.perf_counter()
+                validators = store.validators() if incremental else None
+                results, failed = scrape_all(sections, workers=8, per_host_per_second=0, validators=validators)
+                if incremental:
+                    rows = record(store, sections, results, failed)
+                    store.save_validators(validators)
+                else:
+                    rows = [row for page_rows in results for row in page_rows]
+                elapsed = time.perf_counter() - started
+                print(f"  {label:>15}  {elapsed:6.2f}s  {(server.stats['bytes_sent'] - sent) / 1024:7.0f} KB  "
+                      f"{server.stats['not_modified'] - not_modified:3d} not modified  {len(rows):5d} rows out  "
+                      f"{len(failed)} failed")
+            store.close()
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark teaser extraction modes on fixture pages")
+    parser.add_argument("bench", nargs="?", choices=("extract", "multi", "incremental"), default="extract")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if args.bench == "multi":
+        bench_multi()
+    elif args.bench == "incremental":
+        bench_incremental()
+    else:
+        bench_parse(args.repeat)
+        bench_driver(args.repeat)
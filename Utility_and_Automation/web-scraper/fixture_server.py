@@ -0,0 +1,155 @@
+# Local HTTP server for the fixture pages in fixtures/, so the scrapers can be
+# run and benchmarked without touching the real site.
+#
+#   python fixture_server.py --port 8800 --delay-ms 200
+#
+#   /football.html         the fixture as is
+#   /section/<name>/       football.html with its article links moved under
+#                          /sport/football/<name>/, so every section has its own rows
+#
+# --delay-ms adds server latency to every response, and the server counts
+# requests per path, the peak number handled at once, 304s and body bytes
+# sent (GET /stats).
+#
+# Pages carry an ETag (hash of the body) and a Last-Modified time, and a
+# request whose If-None-Match / If-Modified-Since still matches gets an empty
+# 304. publish(server, name, title) puts a new story at the top of a section,
+# to simulate the site changing between scheduled runs.
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SECTION_FIXTURE = "football.html"
+DEFAULT_PORT = 8800
+STORY_TEMPLATE = ('<div class="teaser-item teaser__small"><div class="teaser__copy-container">'
+                  '<a class="text-anchor-wrap" href="/sport/football/{section}/latest-{n}/">'
+                  '<span class="teaser__kicker t-p-color">BREAKING</span>'
+                  '<h3 class="teaser__headline">{title}</h3></a></div></div>\n')
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    stats = None  # shared per server: requests per path, in-flight counts
+    lock = None
+    stories = None  # section name → [(title, published at)] added by publish()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.lock:
+                body = json.dumps(self.stats).encode("utf-8")
+            self._send(200, body, "application/json")
+            return
+        with self.lock:
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            self.stats["requests"][self.path] = self.stats["requests"].get(self.path, 0) + 1
+        try:
+            time.sleep(self.delay)
+            page = self._page()
+            if page is None:
+                self._send(404, b"not found", "text/plain")
+                return
+            body, modified = page
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            validators = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True)}
+            if self._not_modified(etag, modified):
+                with self.lock:
+                    self.stats["not_modified"] += 1
+                self._send(304, b"", None, validators)
+            else:
+                self._send(200, body, "text/html; charset=utf-8", validators)
+        finally:
+            with self.lock:
+                self.stats["in_flight"] -= 1
+
+    def _not_modified(self, etag, modified):
+        # If-None-Match wins when both are sent, as in RFC 9110
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _page(self):
+        # (body, last modified timestamp), or None
+        path = self.path.split("?", 1)[0]
+        parts = [p for p in path.split("/") if p]
+        if len(parts) == 2 and parts[0] == "section":
+            file_path = os.path.join(FIXTURE_DIR, SECTION_FIXTURE)
+            with open(file_path, encoding="utf-8") as f:
+                html = f.read()
+            html = html.replace("/sport/football/", f"/sport/football/{parts[1]}/")
+            modified = os.path.getmtime(file_path)
+            with self.lock:
+                stories = list(self.stories.get(parts[1], ()))
+            if stories:
+                modified = max(modified, stories[-1][1])
+                html = html.replace('<main class="sun-container">', '<main class="sun-container">\n' + "".join(
+                    STORY_TEMPLATE.format(section=parts[1], n=n, title=title)
+                    for n, (title, _) in reversed(list(enumerate(stories)))), 1)
+            return html.encode("utf-8"), modified
+        name = os.path.basename(path)
+        file_path = os.path.join(FIXTURE_DIR, name)
+        if not name or not os.path.isfile(file_path):
+            return None
+        with open(file_path, "rb") as f:
+            return f.read(), os.path.getmtime(file_path)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.lock:
+            self.stats["bytes_sent"] += len(body)
+
+
+def serve(port=DEFAULT_PORT, delay_ms=0, background=False):
+    stats = {"requests": {}, "in_flight": 0, "max_in_flight": 0, "not_modified": 0, "bytes_sent": 0}
+    handler = type("ConfiguredFixtureHandler", (FixtureHandler,),
+                   {"delay": delay_ms / 1000, "stats": stats, "lock": threading.Lock(), "stories": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    if background:
+        threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+        return server
+    print(f"Serving {FIXTURE_DIR} on http://127.0.0.1:{server.server_address[1]} ({delay_ms:.0f} ms delay)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def publish(server, section, title):
+    # Adds a story to the top of /section/<section>/, changing its ETag and Last-Modified
+    handler = server.RequestHandlerClass
+    with handler.lock:
+        handler.stories.setdefault(section, []).append((title, time.time()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the fixture pages over HTTP")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--delay-ms", type=float, default=0)
+    args = parser.parse_args()
+    serve(args.port, args.delay_ms)
@@ -0,0 +1,259 @@
+# Scrapes many section pages at once and merges them into one CSV.
+#
+#   python multi_scrape.py --config sections.json
+#   python multi_scrape.py https://www.thesun.co.uk/sport/football/ --render http --workers 8
+#
+# Each section is a URL plus optional selectors (see teasers.DEFAULT_SELECTORS)
+# and how to fetch it:
+#   http    - plain GET parsed locally; no browser, for pages that don't need JavaScript
+#   browser - a headless Chrome from a small pool of drivers that are reused
+#             across sections instead of starting one per page
+#
+# Sections are fetched by a thread pool. A per-host rate limit keeps the
+# requests to any one site spaced out however many workers there are.
+# Results are merged in input order, and an article listed in several
+# sections appears once, under the first section that listed it.
+#
+# With --state (a SeenStore database, see seen_store.py) runs are incremental:
+# pages are requested with the ETag / Last-Modified they were last served
+# with, so unchanged pages come back as 304 and are skipped, and the CSV only
+# has the articles that are new or whose title changed since the last run.
+#
+#   python multi_scrape.py --config sections.json --state seen.db
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+from seen_store import SeenStore
+from teasers import DEFAULT_SELECTORS, extract_teasers, parse_teasers
+
+WORKERS = 8
+BROWSERS = 2
+PER_HOST_PER_SECOND = 2.0
+TIMEOUT = 30
+USER_AGENT = "Mozilla/5.0 (compatible; headline-scraper)"
+COLUMNS = ["Section", "Title", "Subitle", "Link"]
+INCREMENTAL_COLUMNS = ["Status"] + COLUMNS
+
+
+class HostRateLimiter:
+    # Spaces request starts to the same host at least 1/per_second apart;
+    # different hosts don't wait for each other
+    def __init__(self, per_second=PER_HOST_PER_SECOND):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class DriverPool:
+    # Up to `size` headless Chrome instances, started on first use and handed
+    # to one section at a time
+    def __init__(self, size=BROWSERS, factory=None):
+        self.size = size
+        self.factory = factory
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def driver(self):
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            driver = None
+            with self._lock:
+                if len(self._drivers) < self.size:
+                    if self.factory is None:
+                        from Webscraper_Auto import make_driver
+                        self.factory = make_driver
+                    driver = self.factory()
+                    self._drivers.append(driver)
+            if driver is None:
+                driver = self._idle.get()  # all in use: wait for one to come back
+        try:
+            yield driver
+        finally:
+            self._idle.put(driver)
+
+    def close(self):
+        for driver in self._drivers:
+            driver.quit()
+        self._drivers = []
+
+
+def load_sections(config_path=None, urls=(), render="http"):
+    sections = []
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            sections = json.load(f)
+    sections += [{"url": url} for url in urls]
+    for section in sections:
+        section.setdefault("render", render)
+        section["selectors"] = {**DEFAULT_SELECTORS, **section.get("selectors", {})}
+    return sections
+
+def fetch_http(url, timeout=TIMEOUT, etag=None, last_modified=None):
+    # Returns (html, final url, (etag, last_modified) of the response);
+    # html is None when the validators given still match (304 Not Modified)
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            html = response.read().decode(charset, errors="replace")
+            return html, response.geturl(), (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, url, (e.headers.get("ETag") or etag, e.headers.get("Last-Modified") or last_modified)
+        raise
+
+def scrape_section(section, limiter, pool, validators=None):
+    # validators: None for a full scrape, else the shared {url: (etag, last_modified)}
+    # from earlier runs; it is updated in place, and None is returned for an unchanged page
+    url = section["url"]
+    limiter.wait(url)
+    if validators is not None:
+        # Browser sections are checked with a plain conditional GET first, so
+        # an unchanged page doesn't cost a browser render
+        etag, last_modified = validators.get(url, (None, None))
+        html, final_url, current = fetch_http(url, etag=etag, last_modified=last_modified)
+        if html is None:
+            return None
+    if section["render"] == "browser":
+        with pool.driver() as driver:
+            if validators is not None:
+                limiter.wait(url)  # the conditional GET above was a request too
+            driver.get(url)
+            rows = extract_teasers(driver, "script", section["selectors"])
+    else:
+        if validators is None:
+            html, final_url, current = fetch_http(url)
+        rows = parse_teasers(html, final_url, section["selectors"])
+    if validators is not None:
+        validators[url] = current
+    return rows
+
+def scrape_all(sections, workers=WORKERS, browsers=BROWSERS, per_host_per_second=PER_HOST_PER_SECOND,
+               validators=None):
+    # Returns (rows per section in input order, {url: error} for sections that failed).
+    # With validators (see scrape_section), unchanged sections give None instead of rows.
+    limiter = HostRateLimiter(per_host_per_second)
+    pool = DriverPool(browsers)
+    failed = {}
+
+    def run(section):
+        try:
+            return scrape_section(section, limiter, pool, validators)
+        except Exception as e:  # one bad section shouldn't lose the others
+            failed[section["url"]] = f"{type(e).__name__}: {e}"
+            return []
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, sections))
+    finally:
+        pool.close()
+    return results, failed
+
+def merge(sections, results):
+    merged, seen = [], set()
+    for section, rows in zip(sections, results):
+        for title, subtitle, link in rows or ():
+            if link is not None:
+                if link in seen:
+                    continue
+                seen.add(link)
+            merged.append({"Section": section.get("name", section["url"]), "Title": title,
+                           "Subitle": subtitle, "Link": link})
+    return merged
+
+def record(store, sections, results, failed):
+    # Stores an incremental run and returns only its new and changed rows.
+    # A link on several sections is recorded and reported under the first
+    # one only, like merge() does, so the sections don't keep overwriting
+    # each other's title for it.
+    now = time.time()
+    rows, seen = [], set()
+    for section, page_rows in zip(sections, results):
+        if section["url"] in failed:
+            continue
+        if page_rows is None:
+            seen |= store.touch_page(section["url"], now)
+            continue
+        name = section.get("name", section["url"])
+        for status, title, subtitle, link in store.update(name, section["url"], page_rows, now, seen):
+            rows.append({"Status": status, "Section": name, "Title": title, "Subitle": subtitle, "Link": link})
+    return rows
+
+def write_csv(path, rows, columns=COLUMNS):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape several section pages in parallel into one CSV")
+    parser.add_argument("urls", nargs="*", help="section URLs (in addition to --config)")
+    parser.add_argument("--config", help="JSON list of sections: url, optional name, render, selectors")
+    parser.add_argument("--render", choices=("http", "browser"), default="http",
+                        help="default fetch method for sections that don't set one")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--browsers", type=int, default=BROWSERS, help="headless Chrome instances in the pool")
+    parser.add_argument("--per-host-rps", type=float, default=PER_HOST_PER_SECOND,
+                        help="requests started per second to any one host (0 = no limit)")
+    parser.add_argument("--state", help="seen-links database; only new or changed articles are written")
+    parser.add_argument("-o", "--output", default=f"Headlines_{datetime.now().strftime('%d-%m-%Y')}.csv")
+    args = parser.parse_args()
+
+    sections = load_sections(args.config, args.urls, args.render)
+    if not sections:
+        parser.error("give section URLs or --config")
+    started = time.perf_counter()
+    if args.state:
+        store = SeenStore(args.state)
+        try:
+            validators = store.validators()
+            results, failed = scrape_all(sections, args.workers, args.browsers, args.per_host_rps, validators)
+            rows = record(store, sections, results, failed)
+            fetched = {section["url"] for section in sections} - set(failed)
+            store.save_validators({url: validators[url] for url in fetched if url in validators})
+        finally:
+            store.close()
+        unchanged = sum(page_rows is None for page_rows in results)
+        summary = (f"{len(sections)} sections ({unchanged} unchanged), "
+                   f"{sum(len(r) for r in results if r)} teasers → {len(rows)} new or changed")
+        if rows:
+            write_csv(args.output, rows, INCREMENTAL_COLUMNS)
+            print(f"{summary}, in {time.perf_counter() - started:.2f}s → {os.path.abspath(args.output)}")
+        else:
+            print(f"{summary}, in {time.perf_counter() - started:.2f}s; nothing written")
+    else:
+        results, failed = scrape_all(sections, args.workers, args.browsers, args.per_host_rps)
+        rows = merge(sections, results)
+        write_csv(args.output, rows)
+        print(f"{len(sections)} sections, {sum(map(len, results))} teasers → {len(rows)} after merging, "
+              f"in {time.perf_counter() - started:.2f}s → {os.path.abspath(args.output)}")
+    for url, error in failed.items():
+        print(f"  failed: {url}: {error}")
@@ -0,0 +1,113 @@
+# Remembers what earlier runs already scraped, so a scheduled run only has to
+# report what is new.
+#
+#   links  - every article link seen, with the section and page it was on, its
+#            current title/subtitle, and when it was first and last seen
+#   pages  - the ETag / Last-Modified each page was last served with, sent back
+#            as If-None-Match / If-Modified-Since so an unchanged page comes
+#            back as an empty 304 and isn't downloaded or parsed again
+#
+# Teasers without a link are keyed on their title and subtitle instead.
+import hashlib
+import sqlite3
+import time
+
+DEFAULT_PATH = "seen.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    key         TEXT PRIMARY KEY,
+    link        TEXT,
+    section     TEXT,
+    page        TEXT,
+    title       TEXT,
+    subtitle    TEXT,
+    fingerprint TEXT,
+    first_seen  REAL,
+    last_seen   REAL
+);
+CREATE INDEX IF NOT EXISTS links_page ON links(page);
+CREATE TABLE IF NOT EXISTS pages (
+    url           TEXT PRIMARY KEY,
+    etag          TEXT,
+    last_modified TEXT,
+    fetched_at    REAL
+);
+"""
+
+
+def row_key(title, subtitle, link):
+    return link if link is not None else "text:" + fingerprint(title, subtitle)
+
+def fingerprint(title, subtitle):
+    return hashlib.sha1(f"{title}\x00{subtitle}".encode("utf-8")).hexdigest()
+
+
+class SeenStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def validators(self):
+        # {page url: (etag, last_modified)} for every page fetched before
+        return {url: (etag, last_modified) for url, etag, last_modified
+                in self.conn.execute("SELECT url, etag, last_modified FROM pages")}
+
+    def save_validators(self, validators, now=None):
+        now = time.time() if now is None else now
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO pages (url, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, "
+                "last_modified = excluded.last_modified, fetched_at = excluded.fetched_at",
+                [(url, etag, last_modified, now) for url, (etag, last_modified) in validators.items()])
+
+    def touch_page(self, page, now=None):
+        # The page answered 304: everything last seen on it is still there.
+        # Returns the keys of those links
+        now = time.time() if now is None else now
+        with self.conn:
+            self.conn.execute("UPDATE links SET last_seen = ? WHERE page = ?", (now, page))
+        return {key for key, in self.conn.execute("SELECT key FROM links WHERE page = ?", (page,))}
+
+    def update(self, section, page, rows, now=None, seen=None):
+        # Records rows scraped from `page` and returns the ones that are new,
+        # or whose title or subtitle changed, each as (status, title, subtitle, link).
+        # seen: keys already recorded this run (from other pages), which are
+        # skipped; it is updated in place
+        now = time.time() if now is None else now
+        seen = set() if seen is None else seen
+        keys = [row_key(*row) for row in rows]
+        known = {}
+        for start in range(0, len(keys), 500):  # stay under SQLite's parameter limit
+            batch = keys[start:start + 500]
+            known.update(self.conn.execute(
+                f"SELECT key, fingerprint FROM links WHERE key IN ({','.join('?' * len(batch))})", batch))
+        changes, inserts, updates, touched = [], [], [], []
+        for key, (title, subtitle, link) in zip(keys, rows):
+            if key in seen:
+                continue  # repeated within this page, or on a page recorded earlier
+            current = fingerprint(title, subtitle)
+            if key not in known:
+                changes.append(("new", title, subtitle, link))
+                inserts.append((key, link, section, page, title, subtitle, current, now, now))
+            elif known[key] != current:
+                changes.append(("changed", title, subtitle, link))
+                updates.append((title, subtitle, current, now, key))
+            else:
+                touched.append((now, key))
+            seen.add(key)
+        with self.conn:
+            self.conn.executemany("INSERT INTO links VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", inserts)
+            self.conn.executemany("UPDATE links SET title = ?, subtitle = ?, fingerprint = ?, last_seen = ? "
+                                  "WHERE key = ?", updates)
+            self.conn.executemany("UPDATE links SET last_seen = ? WHERE key = ?", touched)
+        return changes
+
+    def counts(self):
+        return {"links": self.conn.execute("SELECT COUNT(*) FROM links").fetchone()[0],
+                "pages": self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,133 @@
+# Pulls (title, subtitle, link) out of the teaser containers on a page.
+#
+# Three ways of doing the same extraction:
+#   elements - the original: find_elements + three find_element calls per
+#              container; every call is a WebDriver round trip (1 + 3n)
+#   script   - one execute_script call that walks the DOM in the browser
+#              and returns every field at once (1 round trip)
+#   source   - one page_source call, parsed locally (1 round trip)
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+CONTAINER_CLASS = "teaser__copy-container"
+MODES = ("script", "source", "elements")
+# Container div class, and the tags whose first occurrence inside it holds
+# each field (the link is the tag's href). Other sites pass their own.
+DEFAULT_SELECTORS = {"container": CONTAINER_CLASS, "title": "span", "subtitle": "h3", "link": "a"}
+
+# Same XPaths as the per-element version; innerText is what WebElement.text
+# returns and a.href is the resolved link get_attribute("href") gives back
+TEASER_SCRIPT = """
+const [containerXpath, titleXpath, subtitleXpath, linkXpath] = arguments;
+const containers = document.evaluate(containerXpath, document, null,
+                                     XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+const first = (node, xpath) => document.evaluate(xpath, node, null,
+                                                 XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const rows = [];
+for (let i = 0; i < containers.snapshotLength; i++) {
+    const c = containers.snapshotItem(i);
+    const title = first(c, titleXpath), subtitle = first(c, subtitleXpath), link = first(c, linkXpath);
+    rows.push([title ? title.innerText : null, subtitle ? subtitle.innerText : null,
+               link ? link.href : null]);
+}
+return rows;
+"""
+
+
+def xpaths(selectors):
+    return (f'//div[@class="{selectors["container"]}"]', f'.//{selectors["title"]}',
+            f'.//{selectors["subtitle"]}', f'.//{selectors["link"]}')
+
+def teasers_via_elements(driver, selectors=DEFAULT_SELECTORS):
+    container_xpath, title_xpath, subtitle_xpath, link_xpath = xpaths(selectors)
+    rows = []
+    for container in driver.find_elements("xpath", container_xpath):
+        try:
+            title = container.find_element("xpath", title_xpath).text
+        except Exception:
+            title = None
+        try:
+            subtitle = container.find_element("xpath", subtitle_xpath).text
+        except Exception:
+            subtitle = None
+        try:
+            link = container.find_element("xpath", link_xpath).get_attribute("href")
+        except Exception:
+            link = None
+        rows.append((title, subtitle, link))
+    return rows
+
+def teasers_via_script(driver, selectors=DEFAULT_SELECTORS):
+    return [tuple(row) for row in driver.execute_script(TEASER_SCRIPT, *xpaths(selectors))]
+
+def teasers_via_source(driver, selectors=DEFAULT_SELECTORS):
+    return parse_teasers(driver.page_source, driver.current_url, selectors)
+
+def extract_teasers(driver, mode="script", selectors=DEFAULT_SELECTORS):
+    if mode == "script":
+        return teasers_via_script(driver, selectors)
+    if mode == "source":
+        return teasers_via_source(driver, selectors)
+    if mode == "elements":
+        return teasers_via_elements(driver, selectors)
+    raise ValueError(f"unknown mode {mode!r} (use one of {', '.join(MODES)})")
+
+
+class TeaserParser(HTMLParser):
+    ''' Single pass over the HTML. Inside each container it records the text
+    of the first title and subtitle tags and the href of the first link tag,
+    matching the .// XPaths above. Text is whitespace-normalised the way
+    WebElement.text roughly is. Open elements are kept on a stack, so an
+    unclosed <p> or <li> is closed by its parent's end tag as a browser would. '''
+
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+    def __init__(self, base_url="", selectors=DEFAULT_SELECTORS):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.container = selectors["container"]
+        self.fields = {selectors["title"]: "title", selectors["subtitle"]: "subtitle"}
+        self.link_tag = selectors["link"]
+        self.rows = []
+        self._stack = []        # open elements inside the current container, container first
+        self._row = None
+        self._captures = []     # [field, stack depth of the captured element, text pieces]
+
+    def handle_starttag(self, tag, attrs):
+        if not self._stack:
+            if tag == "div" and dict(attrs).get("class") == self.container:
+                self._stack.append(tag)
+                self._row = {"title": None, "subtitle": None, "link": None}
+            return
+        if tag == self.link_tag and self._row["link"] is None:
+            href = dict(attrs).get("href")
+            self._row["link"] = urljoin(self.base_url, href) if href is not None else None
+        if tag in self.VOID:
+            return
+        self._stack.append(tag)
+        field = self.fields.get(tag)
+        if field and self._row[field] is None and all(c[0] != field for c in self._captures):
+            self._captures.append([field, len(self._stack), []])
+
+    def handle_endtag(self, tag):
+        if tag not in self._stack:
+            return  # stray end tag, or not inside a container
+        while self._stack:
+            if self._captures and self._captures[-1][1] == len(self._stack):
+                field, _, text = self._captures.pop()
+                self._row[field] = " ".join("".join(text).split())
+            if self._stack.pop() == tag:
+                break
+        if not self._stack:
+            self.rows.append((self._row["title"], self._row["subtitle"], self._row["link"]))
+            self._row = None
+
+    def handle_data(self, data):
+        for capture in self._captures:
+            capture[2].append(data)
+
+
+def parse_teasers(html, base_url="", selectors=DEFAULT_SELECTORS):
+    parser = TeaserParser(base_url, selectors)
+    parser.feed(html)
+    parser.close()
+    return parser.rows